@@ -0,0 +1,213 @@
+import json
+import logging
+import sys
+import time
+from array import array
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BOUNDS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+JOIN_TO_VERIFY_BOUNDS_S = (30, 60, 300, 900, 3600, 21600, 86400, 604800)
+
+class RingCounter:
+    def __init__(self, size: int, resolution: int):
+        self.size = size
+        self.resolution = resolution
+        self.counts = array("L", [0] * size)
+        self.last_slot = int(time.time() // resolution)
+
+    def _advance(self, slot: int):
+        if slot <= self.last_slot:
+            return
+        if slot - self.last_slot >= self.size:
+            self.counts = array("L", [0] * self.size)
+        else:
+            for s in range(self.last_slot + 1, slot + 1):
+                self.counts[s % self.size] = 0
+        self.last_slot = slot
+
+    def add(self, ts: float, amount: int = 1):
+        slot = int(ts // self.resolution)
+        self._advance(slot)
+        if self.last_slot - slot < self.size:
+            self.counts[slot % self.size] += amount
+
+    def total(self, now: float, slots: int) -> int:
+        self._advance(int(now // self.resolution))
+        slots = min(slots, self.size)
+        return sum(self.counts[(self.last_slot - i) % self.size] for i in range(slots))
+
+    def series(self, now: float, slots: int = None) -> list:
+        self._advance(int(now // self.resolution))
+        slots = min(slots or self.size, self.size)
+        first = self.last_slot - slots + 1
+        return [(s * self.resolution, self.counts[s % self.size]) for s in range(first, self.last_slot + 1)]
+
+    def to_dict(self) -> dict:
+        return {"resolution": self.resolution, "last_slot": self.last_slot, "counts": self.counts.tolist()}
+
+    def load(self, data: dict):
+        if data.get("resolution") != self.resolution or len(data.get("counts", [])) != self.size:
+            logger.warning(f"Ignoring stored {self.resolution}s rollup with a different layout")
+            return
+        counts = data["counts"]
+        last_slot = data["last_slot"]
+        # Added to what was recorded since startup, since the file may finish loading after the first verifications.
+        self._advance(max(last_slot, int(time.time() // self.resolution)))
+        for s in range(self.last_slot - self.size + 1, last_slot + 1):
+            self.counts[s % self.size] += counts[s % self.size]
+
+class Histogram:
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = array("L", [0] * (len(bounds) + 1))
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                break
+        else:
+            i = len(self.bounds)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q: float):
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def to_dict(self) -> dict:
+        return {"bounds": list(self.bounds), "counts": self.counts.tolist(), "count": self.count, "sum": self.sum}
+
+    def load(self, data: dict):
+        if tuple(data.get("bounds", ())) != self.bounds:
+            logger.warning("Ignoring stored histogram with different bucket bounds")
+            return
+        for i, count in enumerate(data["counts"]):
+            self.counts[i] += count
+        self.count += data["count"]
+        self.sum += data["sum"]
+
+class VerificationAnalytics:
+    def __init__(self):
+        self.total_verifications = 0
+        self.methods = {}
+        self.captcha = {"passed": 0, "failed": 0}
+        self.per_minute = RingCounter(1440, 60)
+        self.per_hour = RingCounter(24 * 14, 3600)
+        self.per_day = RingCounter(365, 86400)
+        self.latency_ms = Histogram(LATENCY_BOUNDS_MS)
+        self.join_to_verify_s = Histogram(JOIN_TO_VERIFY_BOUNDS_S)
+        self.dirty = False
+
+    def record_verification(self, method: str, latency_ms: float = None, join_to_verify_s: float = None, ts: float = None):
+        ts = time.time() if ts is None else ts
+        self.total_verifications += 1
+        self.methods[method] = self.methods.get(method, 0) + 1
+        for counter in (self.per_minute, self.per_hour, self.per_day):
+            counter.add(ts)
+        if latency_ms is not None:
+            self.latency_ms.observe(latency_ms)
+        if join_to_verify_s is not None:
+            self.join_to_verify_s.observe(join_to_verify_s)
+        self.dirty = True
+
+    def record_captcha(self, passed: bool):
+        self.captcha["passed" if passed else "failed"] += 1
+        self.dirty = True
+
+    def summary(self, now: float = None) -> dict:
+        now = time.time() if now is None else now
+        attempts = self.captcha["passed"] + self.captcha["failed"]
+        return {
+            "total_verifications": self.total_verifications,
+            "last_minute": self.per_minute.total(now, 1),
+            "last_hour": self.per_minute.total(now, 60),
+            "last_day": self.per_hour.total(now, 24),
+            "last_week": self.per_day.total(now, 7),
+            "methods": dict(self.methods),
+            "captcha_pass_rate": self.captcha["passed"] / attempts if attempts else None,
+            "latency_ms_p50": self.latency_ms.percentile(0.5),
+            "latency_ms_p99": self.latency_ms.percentile(0.99),
+            "join_to_verify_s_p50": self.join_to_verify_s.percentile(0.5),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "version": 1,
+            "total_verifications": self.total_verifications,
+            "methods": self.methods,
+            "captcha": self.captcha,
+            "per_minute": self.per_minute.to_dict(),
+            "per_hour": self.per_hour.to_dict(),
+            "per_day": self.per_day.to_dict(),
+            "latency_ms": self.latency_ms.to_dict(),
+            "join_to_verify_s": self.join_to_verify_s.to_dict(),
+        }
+
+    def load(self, data: dict):
+        if not data:
+            return
+        self.total_verifications += data.get("total_verifications", 0)
+        for method, count in data.get("methods", {}).items():
+            self.methods[method] = self.methods.get(method, 0) + count
+        for result, count in data.get("captcha", {}).items():
+            self.captcha[result] = self.captcha.get(result, 0) + count
+        for name in ("per_minute", "per_hour", "per_day", "latency_ms", "join_to_verify_s"):
+            if name in data:
+                getattr(self, name).load(data[name])
+
+class GuildAnalytics:
+    def __init__(self):
+        self.guilds = {}
+
+    def guild(self, guild_id: int) -> VerificationAnalytics:
+        analytics = self.guilds.get(guild_id)
+        if analytics is None:
+            analytics = self.guilds[guild_id] = VerificationAnalytics()
+        return analytics
+
+    @property
+    def dirty(self) -> bool:
+        return any(analytics.dirty for analytics in self.guilds.values())
+
+    @dirty.setter
+    def dirty(self, value: bool):
+        for analytics in self.guilds.values():
+            analytics.dirty = value
+
+    def to_dict(self) -> dict:
+        return {"version": 2, "guilds": {str(guild_id): analytics.to_dict() for guild_id, analytics in self.guilds.items()}}
+
+    def load(self, data: dict, default_guild_id: int = None):
+        if not data:
+            return
+        if "guilds" not in data:
+            # Version 1 files held one bot-wide set of counts, which can only be credited to the default guild.
+            if default_guild_id is not None:
+                self.guild(default_guild_id).load(data)
+            else:
+                logger.warning("Ignoring bot-wide analytics saved before they were kept per guild")
+            return
+        for guild_id, guild_data in data["guilds"].items():
+            self.guild(int(guild_id)).load(guild_data)
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/analytics.json"
+    analytics = GuildAnalytics()
+    with open(path, "r", encoding="utf-8") as f:
+        analytics.load(json.load(f), 0)
+    now = time.time()
+    print(json.dumps({
+        str(guild_id): {"summary": guild.summary(now), "per_minute": guild.per_minute.series(now, 60)}
+        for guild_id, guild in analytics.guilds.items()
+    }, indent=2))
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_load import Harness, ErrorCounter, FIRST_USER_ID
+from bench_transfer import make_records
+from fake_discord import FakeDiscord
+
+def seed_store(workdir: str, count: int):
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+    with open(os.path.join(workdir, "data", "verified_users.json"), "w", encoding="utf-8") as f:
+        json.dump(make_records(count), f, separators=(",", ":"))
+
+async def boot(main_module, args, workdir: str) -> dict:
+    fake = FakeDiscord(args.latency, args.jitter)
+    fake.start()
+    errors = ErrorCounter()
+    logging.getLogger().handlers = [errors]
+    h = Harness(main_module, fake, {"SETTINGS.enable_captcha": False}, workdir)
+    try:
+        started = time.perf_counter()
+        await h.start(ready=False)
+        logged_in = time.perf_counter() - started
+
+        # The first click arrives as soon as the gateway delivers the guild, before on_ready.
+        interaction_id = h.click(FIRST_USER_ID - 1)
+        h.expect(("callback", interaction_id))
+        await h.wait(args.timeout)
+        acknowledged = time.perf_counter() - started
+        h.expect(("followup", f"token-{interaction_id}"))
+        await h.wait(args.timeout)
+        verified = time.perf_counter() - started
+
+        await h.ready()
+        await h.bot.boot.wait(args.timeout)
+        complete = time.perf_counter() - started
+        return {
+            "logged_in": logged_in,
+            "first_interaction_acknowledged": acknowledged,
+            "first_verification": verified,
+            "boot_complete": complete,
+            "stages": dict(h.bot.boot.stages),
+            "verified_users_loaded": len(h.bot.data_manager.store),
+            "errors": errors.counts.get("ERROR", 0),
+        }
+    finally:
+        await h.stop()
+        fake.stop()
+
+async def run(args) -> dict:
+    seed_store(args.workdir, args.users)
+    # main configures a bot.log file handler at import time, so import it from inside the scratch directory.
+    os.chdir(args.workdir)
+    import main
+    logging.getLogger("discord").setLevel(logging.WARNING)
+    return await boot(main, args, args.workdir)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-boot the bot against a fake Discord with a large verified-user store")
+    parser.add_argument("--users", type=int, default=500000, help="records in the seeded verified_users.json")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+    args.json = os.path.abspath(args.json) if args.json else None
+    with tempfile.TemporaryDirectory(prefix="verifybot-boot-") as workdir:
+        args.workdir = workdir
+        result = asyncio.run(run(args))
+
+    print(f"Cold boot with {args.users} verified users ({result['verified_users_loaded']} loaded), {result['errors']} errors")
+    for name in ("logged_in", "first_interaction_acknowledged", "first_verification", "boot_complete"):
+        print(f"  {name.replace('_', ' '):<32} {result[name] * 1000:9.0f} ms")
+    for name, seconds in result["stages"].items():
+        print(f"    stage {name:<26} {seconds * 1000:9.0f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"users": args.users, **result}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import asyncio
+import gc
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discord.state import ConnectionState
+from utils import gateway_options
+
+GUILD_ID = 1 << 40
+ROLE_IDS = [str(GUILD_ID + i) for i in range(1, 21)]
+
+class BenchConfig:
+    def __init__(self, gateway: dict):
+        self.data = {"GATEWAY": gateway}
+
+    def get(self, key: str, default=None):
+        return self.data.get(key, default)
+
+MODES = {
+    "all": None,
+    "lean/joined": {"lean_mode": True, "member_cache": "joined"},
+    "lean/none": {"lean_mode": True, "member_cache": "none"},
+}
+
+def member_payload(i: int) -> dict:
+    return {
+        "user": {"id": str(10**17 + i), "username": f"user{i}", "discriminator": "0", "avatar": None, "global_name": f"User {i}"},
+        "roles": ROLE_IDS[: i % 4],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+def presence_payload(i: int) -> dict:
+    return {
+        "user": {"id": str(10**17 + i)},
+        "status": "online",
+        "activities": [{"name": "Bench Game", "type": 0}],
+        "client_status": {"desktop": "online"},
+    }
+
+def guild_payload(members: list, presences: list, member_count: int) -> dict:
+    return {
+        "id": str(GUILD_ID),
+        "name": "Bench Guild",
+        "roles": [{"id": rid, "name": f"role{rid}", "permissions": "0", "position": n, "color": 0, "hoist": False, "managed": False, "mentionable": False}
+                  for n, rid in enumerate([str(GUILD_ID)] + ROLE_IDS)],
+        "channels": [],
+        "emojis": [],
+        "stickers": [],
+        "features": [],
+        "members": members,
+        "presences": presences,
+        "member_count": member_count,
+        "large": True,
+        "owner_id": "1",
+    }
+
+def simulate(options: dict, size: int, joins: int, trace: bool):
+    state = ConnectionState(dispatch=lambda *args: None, handlers={}, hooks={}, http=None, **options)
+
+    # Without lean mode the guild is chunked and presences arrive; lean mode only gets the bot's own member.
+    if options["chunk_guilds_at_startup"]:
+        members = [member_payload(i) for i in range(size)]
+        presences = [presence_payload(i) for i in range(size)] if options["intents"].presences else []
+    else:
+        members, presences = [member_payload(0)], []
+    payload = guild_payload(members, presences, size)
+    del members, presences
+
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    state.parse_guild_create(payload)
+    startup = time.perf_counter() - started
+    del payload
+    for i in range(size, size + joins):
+        state.parse_guild_member_add({"guild_id": str(GUILD_ID), **member_payload(i)})
+    gc.collect()
+    memory = 0
+    if trace:
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return state, startup, memory
+
+def run_mode(name: str, gateway: dict, size: int, joins: int) -> dict:
+    options = gateway_options(BenchConfig(gateway if gateway is not None else {"lean_mode": False}))
+    options.setdefault("chunk_guilds_at_startup", True)
+    _, startup, _ = simulate(options, size, joins, trace=False)
+    state, _, memory = simulate(options, size, joins, trace=True)
+    guild = state._get_guild(GUILD_ID)
+    return {"mode": name, "startup_s": startup, "memory_mb": memory / 1024 / 1024, "cached_members": len(guild._members)}
+
+def run(size: int = 100000, joins: int = 1000):
+    logging.disable(logging.CRITICAL)
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    print(f"Simulated guild: {size:,} members, {joins:,} joins after startup")
+    for name, gateway in MODES.items():
+        result = run_mode(name, gateway, size, joins)
+        print(f"{name:>12}: startup {result['startup_s'] * 1000:>8.1f} ms, memory {result['memory_mb']:>8.1f} MiB, cached members {result['cached_members']:>8,}")
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    )
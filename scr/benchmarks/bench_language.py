@@ -0,0 +1,70 @@
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import LanguageManager
+
+logger = logging.getLogger("legacy_language")
+
+class LegacyLanguageManager(LanguageManager):
+    def get(self, key: str, lang: str = None, **kwargs) -> str:
+        if lang is None:
+            lang = self.default_lang
+            logger.debug(f"Using default language: {lang}")
+            
+        lang_data = self.languages.get(lang, self.languages.get("en", {}))
+        if not lang_data:
+            logger.warning(f"No language data available for '{lang}' or 'en', returning key: {key}")
+            return key
+        
+        keys = key.split('.')
+        value = lang_data
+        
+        for k in keys:
+            if isinstance(value, dict) and k in value:
+                value = value[k]
+            else:
+                logger.warning(f"Key '{key}' not found in language '{lang}', returning key as fallback")
+                return key
+        
+        if isinstance(value, dict):
+            logger.warning(f"Key '{key}' points to dict, not string")
+            return key
+            
+        if isinstance(value, str):
+            try:
+                formatted_value = value.format(**kwargs)
+                logger.debug(f"Resolved key '{key}' in language '{lang}' to: {formatted_value}")
+                return formatted_value
+            except KeyError as e:
+                logger.warning(f"Missing format key {e} for string: {value}")
+                return value
+        
+        return str(value)
+
+def build_dm_embed_strings(lang):
+    return (
+        lang.get("dm_notifications.verify_success.title"),
+        lang.get("dm_notifications.verify_success.description", server_name="Bench Server"),
+        lang.get("dm_notifications.verify_success.features_title"),
+        lang.get("dm_notifications.verify_success.features_content"),
+        lang.get("dm_notifications.verify_success.footer", server_name="Bench Server"),
+        lang.get("logging.user_verified.description", user_mention="<@1>", user_name="user#0001", method="Button", timestamp=0),
+    )
+
+def run(number: int = 50000):
+    logging.disable(logging.CRITICAL)
+    results = {}
+    for name, cls in (("legacy", LegacyLanguageManager), ("compiled", LanguageManager)):
+        lang = cls("en")
+        assert build_dm_embed_strings(lang) == build_dm_embed_strings(LegacyLanguageManager("en"))
+        elapsed = min(timeit.repeat(lambda: build_dm_embed_strings(lang), number=number, repeat=3))
+        results[name] = number * 6 / elapsed
+        print(f"{name:>9}: {results[name]:>12,.0f} lookups/s")
+    print(f"  speedup: {results['compiled'] / results['legacy']:.2f}x")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
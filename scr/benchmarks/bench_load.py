@@ -0,0 +1,451 @@
+import argparse
+import asyncio
+import gc
+import itertools
+from collections import Counter
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SCR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCR_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_discord import FakeDiscord, BOT_ID, APPLICATION_ID, member_payload
+from utils import Config
+import captcha
+
+GUILD_ID = 800000000000000001
+VERIFY_CHANNEL_ID = 800000000000000010
+LOG_CHANNEL_ID = 800000000000000011
+VERIFY_ROLE_ID = 800000000000000020
+UNVERIFIED_ROLE_ID = 800000000000000021
+FIRST_USER_ID = 10 ** 17
+
+# Burst scenarios yield after every event, like the gateway reader does between frames.
+# Pacing in the shipped config is tuned for real Discord limits; the fake server enforces its own (--rate-limit).
+BASE_OVERRIDES = {
+    "GUILD_ID": GUILD_ID,
+    "GUILDS": {},
+    "CHANNELS": {"verify": VERIFY_CHANNEL_ID, "log": LOG_CHANNEL_ID},
+    "ROLES": {"verify": VERIFY_ROLE_ID, "unverified": UNVERIFIED_ROLE_ID},
+    "SHARDING.enabled": False,
+    "METRICS.enabled": False,
+    "RELOAD.enabled": False,
+    "DATA.folder": "data",
+    "DATA.verified_users_file": "data/verified_users.json",
+    "DATA.analytics_file": "data/analytics.json",
+    "JOIN_PIPELINE.role_rate": 1000,
+    "JOIN_PIPELINE.role_per": 1,
+    "DM_NOTIFICATIONS.dm_rate": 1000,
+    "DM_NOTIFICATIONS.dm_per": 1,
+    "LOG_SINK.message_rate": 1000,
+    "LOG_SINK.message_per": 1,
+    "SETTINGS.default_language": "en",
+    "SETTINGS.captcha_type": "math",
+}
+
+SCENARIOS = {
+    "joins": {"description": "10k joins/minute", "count": 1667, "rate": 10000 / 60},
+    "reactions": {"description": "1k concurrent reaction verifications", "count": 1000, "overrides": {"SETTINGS.verification_type": "reaction"}},
+    "button": {"description": "1k concurrent button clicks, captcha off", "count": 1000, "overrides": {"SETTINGS.enable_captcha": False}},
+    "clicks": {"description": "1k concurrent button clicks to captcha modal", "count": 1000},
+    "captcha": {"description": "1k concurrent captcha submissions", "count": 1000},
+    "image": {"description": "200 concurrent button clicks to image captcha", "count": 200, "requires_pillow": True, "overrides": {
+        "SETTINGS.captcha_type": "image", "CAPTCHA.pool_size": 50, "CAPTCHA.workers": 2,
+    }},
+    "timeouts": {"description": "1k unverified joins reminded after 1s and kicked after 2s", "count": 1000, "overrides": {
+        "SETTINGS.unverified_reminder_after": 1, "SETTINGS.unverified_kick_after": 2,
+        "PENDING_MEMBERS.action_rate": 1000, "PENDING_MEMBERS.action_per": 1,
+    }},
+}
+
+def apply_overrides(config: dict, overrides: dict) -> dict:
+    for key, value in overrides.items():
+        target = config
+        *sections, name = key.split(".")
+        for section in sections:
+            target = target.setdefault(section, {})
+        target[name] = value
+    return config
+
+def guild_payload() -> dict:
+    roles = [(GUILD_ID, "@everyone"), (VERIFY_ROLE_ID, "Verified"), (UNVERIFIED_ROLE_ID, "Unverified")]
+    return {
+        "id": str(GUILD_ID),
+        "name": "Load Test Guild",
+        "roles": [{"id": str(rid), "name": name, "permissions": "0", "position": n, "color": 0, "hoist": False, "managed": False, "mentionable": False}
+                  for n, (rid, name) in enumerate(roles)],
+        "channels": [{"id": str(cid), "name": name, "type": 0, "position": n, "permission_overwrites": []}
+                     for n, (cid, name) in enumerate([(VERIFY_CHANNEL_ID, "verify"), (LOG_CHANNEL_ID, "log")])],
+        "emojis": [],
+        "stickers": [],
+        "features": [],
+        "members": [member_payload(BOT_ID)],
+        "presences": [],
+        "member_count": 1,
+        "large": True,
+        "owner_id": "1",
+    }
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class ErrorCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.counts = {}
+        self.samples = {}
+
+    def emit(self, record: logging.LogRecord):
+        self.counts[record.levelname] = self.counts.get(record.levelname, 0) + 1
+        if record.levelno >= logging.ERROR and len(self.samples) < 3:
+            self.samples.setdefault(record.getMessage()[:120], record.levelname)
+
+class Harness:
+    def __init__(self, main_module, fake: FakeDiscord, overrides: dict, workdir: str):
+        self.main = main_module
+        self.fake = fake
+        self.overrides = overrides
+        self.workdir = workdir
+        self.bot = None
+        self.loop = None
+        self.ids = itertools.count(700000000000000000)
+        self.pending = {}
+        self.seen = Counter()
+        self.latencies = []
+        self.first_started = None
+        self.last_done = None
+        self.all_done = asyncio.Event()
+        self.modal_handler = None
+
+    async def start(self, ready: bool = True):
+        self.loop = asyncio.get_running_loop()
+        with open(os.path.join(SCR_DIR, "config.json"), "r", encoding="utf-8") as f:
+            config = apply_overrides(json.load(f), {**BASE_OVERRIDES, **self.overrides})
+        config_path = os.path.join(self.workdir, "config.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+
+        os.chdir(self.workdir)
+        self.main.Config = lambda: Config(config_path)
+        self.fake.on_request = self._on_request
+        self.bot = self.main.VerificationBot()
+        await self.bot.login("fake-token")
+        self.state.parse_guild_create(guild_payload())
+        if ready:
+            await self.ready()
+
+    async def ready(self):
+        # What discord.py does once the gateway's READY has been processed.
+        self.bot._handle_ready()
+        await self.bot.on_ready()
+
+    async def stop(self):
+        self.fake.on_request = None
+        # Requests count as done when the fake receives them, so give their responses time to arrive before the session closes.
+        await asyncio.sleep(max(0.1, self.fake.latency + self.fake.jitter))
+        await self.bot.close()
+
+    @property
+    def state(self):
+        return self.bot._connection
+
+    def expect(self, key):
+        now = time.perf_counter()
+        if self.first_started is None:
+            self.first_started = now
+        self.pending[key] = now
+        self.all_done.clear()
+
+    def _on_request(self, method: str, path: str, body):
+        self.loop.call_soon_threadsafe(self._complete, method, path.strip("/").split("/"), body, time.perf_counter())
+
+    def _complete(self, method: str, parts: list, body, at: float):
+        if parts[0] == "guilds" and "roles" in parts and method == "PUT":
+            key = ("role", int(parts[3]), int(parts[5]))
+        elif parts[0] == "guilds" and parts[2:3] == ["members"] and len(parts) == 4 and method == "DELETE":
+            key = ("kick", int(parts[3]))
+        elif parts[0] == "interactions" and parts[-1] == "callback":
+            key = ("callback", int(parts[1]))
+            if body and body.get("type") == 9 and self.modal_handler:
+                self.modal_handler(int(parts[1]), body["data"])
+        elif parts[0] == "webhooks" and method == "POST":
+            key = ("followup", parts[2])
+        else:
+            return
+        self._record(key, at)
+        # Image captchas arrive with the callback when pregenerated and in a followup when the click had to be deferred.
+        if body and (body.get("data") or body).get("attachments"):
+            token = parts[2] if key[0] == "followup" else f"token-{parts[1]}"
+            self._record(("image", int(token.split("-")[1])), at)
+
+    def _record(self, key, at: float):
+        self.seen[key] += 1
+        started = self.pending.pop(key, None)
+        if started is None:
+            return
+        self.latencies.append(at - started)
+        self.last_done = at
+        if not self.pending:
+            self.all_done.set()
+
+    async def wait(self, timeout: float) -> bool:
+        if not self.pending:
+            return True
+        try:
+            await asyncio.wait_for(self.all_done.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def interaction(self, user_id: int, interaction_type: int, data: dict) -> tuple:
+        interaction_id = next(self.ids)
+        return interaction_id, {
+            "id": str(interaction_id),
+            "application_id": str(APPLICATION_ID),
+            "type": interaction_type,
+            "token": f"token-{interaction_id}",
+            "version": 1,
+            "guild_id": str(GUILD_ID),
+            "channel": {"id": str(VERIFY_CHANNEL_ID), "type": 0},
+            "channel_id": str(VERIFY_CHANNEL_ID),
+            "member": member_payload(user_id, [UNVERIFIED_ROLE_ID]),
+            "data": data,
+            "locale": "en-US",
+            "guild_locale": "en-US",
+            "app_permissions": "0",
+            "attachment_size_limit": 8 * 1024 * 1024,
+            "entitlements": [],
+            "authorizing_integration_owners": {},
+        }
+
+    def click(self, user_id: int) -> int:
+        interaction_id, payload = self.interaction(user_id, 3, {"custom_id": "verify_now", "component_type": 2})
+        self.state.parse_interaction_create(payload)
+        return interaction_id
+
+def modal_submission(components: list, value: str) -> list:
+    submitted = []
+    for component in components:
+        if component.get("type") == 4:
+            submitted.append({"type": 4, "custom_id": component["custom_id"], "value": value})
+        elif "components" in component:
+            submitted.append({"type": component["type"], "components": modal_submission(component["components"], value)})
+        elif "component" in component:
+            submitted.append({"type": component["type"], "component": modal_submission([component["component"]], value)[0]})
+    return submitted
+
+async def scenario_joins(h: Harness, count: int, rate: float = None, **_):
+    started = time.perf_counter()
+    for i in range(count):
+        user_id = FIRST_USER_ID + i
+        h.expect(("role", user_id, UNVERIFIED_ROLE_ID))
+        h.state.parse_guild_member_add({"guild_id": str(GUILD_ID), **member_payload(user_id)})
+        if rate:
+            delay = started + (i + 1) / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+async def scenario_reactions(h: Harness, count: int, **_):
+    message_id = h.bot.guild_registry.contexts[GUILD_ID].verification_message_id
+    for i in range(count):
+        user_id = FIRST_USER_ID + i
+        h.expect(("role", user_id, VERIFY_ROLE_ID))
+        h.state.parse_message_reaction_add({
+            "user_id": str(user_id),
+            "channel_id": str(VERIFY_CHANNEL_ID),
+            "message_id": str(message_id),
+            "guild_id": str(GUILD_ID),
+            "emoji": {"id": None, "name": "✅"},
+            "member": member_payload(user_id, [UNVERIFIED_ROLE_ID]),
+            "burst": False,
+            "type": 0,
+        })
+        await asyncio.sleep(0)
+
+async def scenario_button(h: Harness, count: int, **_):
+    for i in range(count):
+        user_id = FIRST_USER_ID + i
+        h.expect(("role", user_id, VERIFY_ROLE_ID))
+        h.click(user_id)
+        await asyncio.sleep(0)
+
+async def scenario_clicks(h: Harness, count: int, **_):
+    for i in range(count):
+        # Dispatch only schedules the callback, so registering the interaction right after is still in time.
+        h.expect(("callback", h.click(FIRST_USER_ID + i)))
+        await asyncio.sleep(0)
+
+async def scenario_captcha(h: Harness, count: int, **_):
+    modals = {}
+
+    def on_modal(interaction_id: int, data: dict):
+        modals[interaction_id] = data
+        if len(modals) == count:
+            opened.set()
+
+    opened = asyncio.Event()
+    h.modal_handler = on_modal
+    users = {}
+    for i in range(count):
+        user_id = FIRST_USER_ID + i
+        users[h.click(user_id)] = user_id
+        await asyncio.sleep(0)
+    await asyncio.wait_for(opened.wait(), 60)
+
+    # Timing starts at the submissions; opening the modals is the "clicks" scenario.
+    h.latencies.clear()
+    h.first_started = None
+    for interaction_id, data in modals.items():
+        user_id = users[interaction_id]
+        answer = h.bot.captcha.challenges[(GUILD_ID, user_id)][1]
+        h.expect(("role", user_id, VERIFY_ROLE_ID))
+        _, payload = h.interaction(user_id, 5, {"custom_id": data["custom_id"], "components": modal_submission(data["components"], answer)})
+        h.state.parse_interaction_create(payload)
+        await asyncio.sleep(0)
+
+async def scenario_image(h: Harness, count: int, **_):
+    # Clicks start as soon as the bot is up, so the first ones land while the workers are still warming the pool.
+    for i in range(count):
+        h.expect(("image", h.click(FIRST_USER_ID + i)))
+        await asyncio.sleep(0)
+
+async def scenario_timeouts(h: Harness, count: int, **_):
+    # Latency here includes the 2s deadline itself.
+    for i in range(count):
+        user_id = FIRST_USER_ID + i
+        h.expect(("kick", user_id))
+        h.state.parse_guild_member_add({"guild_id": str(GUILD_ID), **member_payload(user_id)})
+        await asyncio.sleep(0)
+
+async def sample_loop_lag(samples: list, interval: float = 0.01):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - started - interval))
+
+async def run_scenario(main_module, name: str, args, trace: bool) -> dict:
+    spec = SCENARIOS[name]
+    overrides = {**spec.get("overrides", {}), **args.overrides}
+    fake = FakeDiscord(args.latency, args.jitter, args.rate_limit, args.rate_limit_chance)
+    fake.start()
+    workdir = tempfile.mkdtemp(prefix=f"bench-{name}-", dir=args.workdir)
+    errors = ErrorCounter()
+    logging.getLogger().handlers = [errors]
+    harness = Harness(main_module, fake, overrides, workdir)
+    lag = []
+    try:
+        await harness.start()
+        gc.collect()
+        baseline = 0
+        if trace:
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+        lag_task = asyncio.create_task(sample_loop_lag(lag))
+        requests_before = sum(fake.log.counts.values())
+        await globals()[f"scenario_{name}"](harness, args.count or spec["count"], rate=spec.get("rate"))
+        completed = await harness.wait(args.drain_timeout)
+        lag_task.cancel()
+        peak = 0
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            tracemalloc.stop()
+    finally:
+        await harness.stop()
+        fake.stop()
+
+    count = len(harness.latencies)
+    elapsed = (harness.last_done or 0) - (harness.first_started or 0)
+    return {
+        "scenario": name,
+        "description": spec["description"],
+        "completed": count,
+        "expected": count + len(harness.pending),
+        "drained": completed,
+        "throughput_per_s": count / elapsed if elapsed > 0 else 0.0,
+        "latency_p50_ms": percentile(harness.latencies, 0.5) * 1000,
+        "latency_p99_ms": percentile(harness.latencies, 0.99) * 1000,
+        "loop_lag_p99_ms": percentile(lag, 0.99) * 1000,
+        "loop_lag_max_ms": max(lag, default=0.0) * 1000,
+        "memory_peak_mb": peak / 1024 / 1024,
+        "http_requests": sum(fake.log.counts.values()) - requests_before,
+        "http_429": fake.log.rate_limited,
+        "warnings": errors.counts.get("WARNING", 0),
+        "errors": errors.counts.get("ERROR", 0) + errors.counts.get("CRITICAL", 0),
+        "error_samples": list(errors.samples),
+    }
+
+def parse_override(text: str) -> tuple:
+    key, _, value = text.partition("=")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+def print_result(result: dict, memory: bool):
+    memory_text = f", mem {result['memory_peak_mb']:>6.1f} MiB" if memory else ""
+    print(
+        f"{result['scenario']:>9}: {result['completed']:>5}/{result['expected']:<5} "
+        f"{result['throughput_per_s']:>7.1f}/s, p50 {result['latency_p50_ms']:>7.1f} ms, p99 {result['latency_p99_ms']:>7.1f} ms, "
+        f"loop lag p99 {result['loop_lag_p99_ms']:>5.1f} ms (max {result['loop_lag_max_ms']:>6.1f}){memory_text}, "
+        f"{result['http_requests']} requests ({result['http_429']} x 429), {result['errors']} errors"
+    )
+    for sample in result["error_samples"]:
+        print(f"{'':>11}error: {sample}")
+
+async def run(args):
+    # main configures a bot.log file handler at import time, so import it from inside the scratch directory.
+    os.chdir(args.workdir)
+    import main
+    logging.getLogger("discord").setLevel(logging.WARNING)
+
+    print(f"Fake Discord: latency {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms, "
+          f"rate limit {args.rate_limit or 'off'}/s per route, random 429 chance {args.rate_limit_chance:.0%}")
+    results = []
+    for name in args.scenarios:
+        if SCENARIOS[name].get("requires_pillow") and captcha.Image is None:
+            print(f"{name:>9}: skipped, Pillow is not installed")
+            continue
+        result = await run_scenario(main, name, args, trace=False)
+        if args.memory:
+            result["memory_peak_mb"] = (await run_scenario(main, name, args, trace=True))["memory_peak_mb"]
+        print_result(result, args.memory)
+        results.append(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the bot against a local fake of Discord's REST API and gateway")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--count", type=int, help="events per scenario (default depends on the scenario)")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake REST latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--rate-limit", type=float, help="requests per second per route bucket before 429s")
+    parser.add_argument("--rate-limit-chance", type=float, default=0.0, help="chance of a random 429 per request")
+    parser.add_argument("--drain-timeout", type=float, default=60)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the traced pass that measures memory")
+    parser.add_argument("--set", dest="overrides", action="append", type=parse_override, default=[], metavar="SECTION.key=VALUE")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario {', '.join(unknown)}")
+    args.overrides = dict(args.overrides)
+    args.json = os.path.abspath(args.json) if args.json else None
+    with tempfile.TemporaryDirectory(prefix="verifybot-bench-") as workdir:
+        args.workdir = workdir
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
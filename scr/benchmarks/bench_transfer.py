@@ -0,0 +1,60 @@
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transfer import export_records, read_records
+
+METHODS = ("button", "reaction", "captcha")
+
+def make_records(count: int) -> list:
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [{
+        "id": 10**17 + rng.randrange(10**17),
+        "name": f"user{i}",
+        "verified_at": str(start + timedelta(seconds=i * 37, microseconds=rng.randrange(10**6))),
+        "method": METHODS[i % 3],
+    } for i in range(count)]
+
+def measure_load(path: str, fmt: str):
+    started = time.perf_counter()
+    loaded = sum(1 for _ in read_records(path, fmt))
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    for _ in read_records(path, fmt):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return loaded, elapsed, peak
+
+def run(count: int = 100000):
+    records = make_records(count)
+    print(f"{count:,} verified users")
+    with tempfile.TemporaryDirectory() as folder:
+        legacy = os.path.join(folder, "verified_users.json")
+        with open(legacy, "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2, ensure_ascii=False)
+        files = [("json (indent=2)", legacy, "json")]
+        for label, name, fmt in (("json (compact)", "compact.json", "json"), ("ndjson", "export.ndjson", "ndjson"), ("bin", "export.bin", "bin")):
+            path = os.path.join(folder, name)
+            started = time.perf_counter()
+            export_records(iter(records), path, fmt)
+            print(f"  wrote {label:<16} in {(time.perf_counter() - started) * 1000:>7.0f} ms")
+            files.append((label, path, fmt))
+
+        baseline = os.path.getsize(legacy)
+        for label, path, fmt in files:
+            size = os.path.getsize(path)
+            loaded, elapsed, peak = measure_load(path, fmt)
+            assert loaded == count
+            print(f"{label:>16}: {size / 1024 / 1024:>7.2f} MiB ({size / baseline:>4.0%}), load {elapsed * 1000:>7.0f} ms, peak {peak / 1024 / 1024:>7.1f} MiB")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
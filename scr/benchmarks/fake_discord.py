@@ -0,0 +1,229 @@
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from aiohttp import web
+from discord.http import Route
+
+# Path segments whose following id is a "major parameter" in Discord's rate limit buckets.
+MAJOR_SEGMENTS = ("guilds", "channels", "webhooks", "interactions")
+
+UNLIMITED = 10000
+
+BOT_ID = 900000000000000001
+APPLICATION_ID = 900000000000000002
+
+def snowflakes(start: int = 1 << 50):
+    return itertools.count(start)
+
+def user_payload(user_id: int, name: str = None, bot: bool = False) -> dict:
+    return {"id": str(user_id), "username": name or f"user{user_id}", "discriminator": "0", "avatar": None, "global_name": name, "bot": bot}
+
+def member_payload(user_id: int, roles: list = (), joined_at: str = None) -> dict:
+    return {
+        "user": user_payload(user_id),
+        "roles": [str(role_id) for role_id in roles],
+        "joined_at": joined_at or datetime.now(timezone.utc).isoformat(),
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+        "permissions": "0",
+    }
+
+def message_payload(message_id: int, channel_id: int, body: dict = None) -> dict:
+    body = body or {}
+    return {
+        "id": str(message_id),
+        "channel_id": str(channel_id),
+        "author": user_payload(BOT_ID, "VerifyBot", bot=True),
+        "content": body.get("content") or "",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": body.get("embeds") or [],
+        "components": body.get("components") or [],
+        "pinned": False,
+        "type": 0,
+        "flags": body.get("flags", 0),
+    }
+
+def bucket_key(method: str, path: str) -> str:
+    parts = path.strip("/").split("/")
+    key = []
+    for i, part in enumerate(parts):
+        key.append(part if not part.isdigit() or (i and parts[i - 1] in MAJOR_SEGMENTS) else ":id")
+    return f"{method} /{'/'.join(key)}"
+
+def json_response(payload, status: int = 200, headers: dict = None) -> web.Response:
+    # discord.py only decodes bodies whose content type is exactly "application/json", as Discord sends it.
+    response = web.Response(body=json.dumps(payload).encode("utf-8"), status=status, headers=headers)
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+class RequestLog:
+    def __init__(self):
+        self.counts = {}
+        self.rate_limited = 0
+
+    def record(self, method: str, path: str):
+        key = bucket_key(method, path)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+# Serves the REST routes the bot uses from a background thread with its own event loop,
+# so the bot's loop lag is not mixed up with the server's.
+class FakeDiscord:
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, rate_limit: float = None, rate_limit_chance: float = 0.0, seed: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_limit_chance = rate_limit_chance
+        self.rng = random.Random(seed)
+        self.ids = snowflakes()
+        self.buckets = {}
+        self.log = RequestLog()
+        self.loop = None
+        self.runner = None
+        self.port = None
+        self.thread = None
+        self.ready = threading.Event()
+        # Called in the server thread with (method, path, body) after the response delay, before replying.
+        self.on_request = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/api/v10"
+
+    def start(self):
+        self.thread = threading.Thread(target=self._serve, name="fake-discord", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        Route.BASE = self.base_url
+
+    def stop(self):
+        if self.loop:
+            asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(5)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(5)
+        Route.BASE = "https://discord.com/api/v10"
+
+    def _serve(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        app = web.Application()
+        app.router.add_route("*", "/api/v10/{path:.*}", self._handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        self.loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+
+    def _throttle(self, key: str) -> tuple:
+        # Fixed one-second windows per bucket, reported through the same headers Discord sends.
+        limited = self.rate_limit and "/interactions/" not in key and not key.startswith("POST /webhooks")
+        limit = int(self.rate_limit) if limited else UNLIMITED
+        now = time.monotonic()
+        window_start, used = self.buckets.get(key, (now, 0))
+        if now - window_start >= 1.0:
+            window_start, used = now, 0
+        reset_after = max(0.001, window_start + 1.0 - now)
+        headers = {
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(max(0, limit - used - 1)),
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            "X-RateLimit-Bucket": key,
+        }
+        if self.rate_limit_chance and self.rng.random() < self.rate_limit_chance:
+            return 0.1 + self.rng.random() * 0.4, headers
+        if used >= limit:
+            self.buckets[key] = (window_start, used)
+            return reset_after, headers
+        self.buckets[key] = (window_start, used + 1)
+        return 0.0, headers
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        path = "/" + request.match_info["path"]
+        body = await self._read_body(request)
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+
+        key = bucket_key(request.method, path)
+        retry_after, headers = self._throttle(key)
+        if retry_after:
+            self.log.rate_limited += 1
+            return json_response(
+                {"message": "You are being rate limited.", "retry_after": retry_after, "global": False},
+                status=429,
+                headers={**headers, "X-RateLimit-Remaining": "0", "Retry-After": f"{retry_after:.3f}", "X-RateLimit-Scope": "user", "Via": "1.1 google"},
+            )
+
+        self.log.record(request.method, path)
+        if self.on_request:
+            self.on_request(request.method, path, body)
+        status, payload = self._route(request.method, path.strip("/").split("/"), body)
+        if payload is None:
+            return web.Response(status=status, headers=headers)
+        return json_response(payload, status=status, headers=headers)
+
+    async def _read_body(self, request: web.Request):
+        if not request.can_read_body:
+            return None
+        if request.content_type.startswith("multipart/"):
+            # Every part is read, since a body left unread makes the server drop the keep-alive connection.
+            payload = None
+            reader = await request.multipart()
+            async for part in reader:
+                if part.name == "payload_json":
+                    payload = json.loads(await part.text())
+                else:
+                    await part.release()
+            return payload
+        try:
+            return await request.json()
+        except ValueError:
+            return None
+
+    def _route(self, method: str, parts: list, body):
+        if parts == ["users", "@me"]:
+            return 200, user_payload(BOT_ID, "VerifyBot", bot=True)
+        if parts == ["oauth2", "applications", "@me"]:
+            return 200, {
+                "id": str(APPLICATION_ID), "name": "VerifyBot", "description": "", "icon": None,
+                "bot_public": True, "bot_require_code_grant": False, "verify_key": "0" * 64,
+                "owner": user_payload(1, "owner"), "flags": 0, "team": None,
+            }
+        if parts[0] == "applications" and parts[-1] == "commands":
+            return 200, []
+        if parts == ["users", "@me", "channels"]:
+            recipient = int(body["recipient_id"])
+            return 200, {"id": str(recipient + 1), "type": 1, "recipients": [user_payload(recipient)], "last_message_id": None}
+        if parts[0] == "channels" and parts[-1] == "messages" and method == "POST":
+            return 200, message_payload(next(self.ids), int(parts[1]), body)
+        if parts[0] == "channels" and "reactions" in parts:
+            return 204, None
+        if parts[0] == "guilds" and "roles" in parts and method in ("PUT", "DELETE"):
+            return 204, None
+        if parts[0] == "guilds" and parts[2:3] == ["members"] and len(parts) == 4 and method == "GET":
+            return 200, member_payload(int(parts[3]))
+        if parts[0] == "guilds" and parts[2:3] == ["members"] and len(parts) == 4 and method == "DELETE":
+            return 204, None
+        if parts[0] == "interactions" and parts[-1] == "callback":
+            return 200, {
+                "interaction": {"id": parts[1], "type": body.get("type") if body else 0, "response_message_loading": body.get("type") == 5 if body else False},
+                "resource": {"type": body.get("type")} if body else None,
+            }
+        if parts[0] == "webhooks":
+            if method == "POST":
+                return 200, message_payload(next(self.ids), 0, body)
+            if method == "PATCH":
+                return 200, message_payload(int(parts[-1]) if parts[-1].isdigit() else next(self.ids), 0, body)
+            return 204, None
+        return 404, {"message": "Unknown route", "code": 0}
@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_load import Harness, ErrorCounter, GUILD_ID, VERIFY_ROLE_ID, FIRST_USER_ID
+from fake_discord import FakeDiscord
+
+# Without GUILD_ID the bot finds its server from the verify channel when it connects, which hot reloads must not undo.
+OVERRIDES = {
+    "GUILD_ID": None,
+    "SETTINGS.enable_captcha": False,
+    "RELOAD.enabled": True,
+    "RELOAD.interval": 3600,
+}
+
+def rewrite_config(path: str, server_name: str, language: str):
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    config["SERVER_NAME"] = server_name
+    config["SETTINGS"]["default_language"] = language
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+
+async def run(args) -> bool:
+    # main configures a bot.log file handler at import time, so import it from inside the scratch directory.
+    os.chdir(args.workdir)
+    import main
+    logging.getLogger("discord").setLevel(logging.WARNING)
+    fake = FakeDiscord(args.latency, args.jitter)
+    fake.start()
+    errors = ErrorCounter()
+    logging.getLogger().handlers = [errors]
+    h = Harness(main, fake, OVERRIDES, args.workdir)
+    kept = []
+    try:
+        await h.start()
+        registry = h.bot.guild_registry
+        discovered = registry.default_guild_id == GUILD_ID
+        config_path = h.bot.config.config_path
+        started = time.perf_counter()
+        user_id = FIRST_USER_ID
+        for i in range(args.reloads):
+            # Every other reload changes only the language files, which goes through the same apply step.
+            if i % 2 == 0:
+                rewrite_config(config_path, f"Reload Test {i}", "vi" if i % 4 == 0 else "en")
+                await h.bot.reloader.reload(config=True, languages=False)
+            else:
+                await h.bot.reloader.reload(config=False, languages=True)
+            kept.append(registry.is_configured(GUILD_ID) and await registry.get(GUILD_ID) is not None)
+            for _ in range(args.clicks):
+                h.expect(("role", user_id, VERIFY_ROLE_ID))
+                h.click(user_id)
+                user_id += 1
+            await asyncio.sleep(0)
+        drained = await h.wait(args.drain_timeout)
+        elapsed = time.perf_counter() - started
+        context = registry.contexts.get(GUILD_ID)
+        server_name = context.server_name if context else None
+        reloads = dict(h.bot.reloader.metrics)
+    finally:
+        await h.stop()
+        fake.stop()
+
+    verified = sum(1 for uid in range(FIRST_USER_ID, user_id) if h.seen[("role", uid, VERIFY_ROLE_ID)] == 1)
+    last_config = max(i for i in range(args.reloads) if i % 2 == 0) if args.reloads else None
+    checks = {
+        "default guild found from the verify channel": discovered,
+        "default guild still configured after every reload": all(kept),
+        "every reload applied": reloads["reloads"] == args.reloads and reloads["rejected"] == 0,
+        "latest SERVER_NAME in use": last_config is None or server_name == f"Reload Test {last_config}",
+        "every click verified once": drained and verified == user_id - FIRST_USER_ID,
+        "no errors logged": errors.counts.get("ERROR", 0) == 0,
+    }
+    print(f"{args.reloads} reloads with {args.clicks} clicks after each in {elapsed:.2f}s, "
+          f"{verified}/{user_id - FIRST_USER_ID} verified, reloads: {reloads}, errors: {errors.counts.get('ERROR', 0)}")
+    for sample in errors.samples:
+        print(f"  error: {sample}")
+    for name, ok in checks.items():
+        print(f"  [{'ok' if ok else 'FAIL'}] {name}")
+    return all(checks.values())
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Hot-reload config and language files while verifying, with the server found from the verify channel")
+    parser.add_argument("--reloads", type=int, default=20)
+    parser.add_argument("--clicks", type=int, default=5, help="button clicks sent after each reload")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--drain-timeout", type=float, default=60)
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="verifybot-reload-") as workdir:
+        args.workdir = workdir
+        return 0 if asyncio.run(run(args)) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_load import Harness, ErrorCounter, GUILD_ID, VERIFY_CHANNEL_ID, VERIFY_ROLE_ID, UNVERIFIED_ROLE_ID, FIRST_USER_ID
+from fake_discord import FakeDiscord, member_payload
+from shared_store import SharedStore, SharedVerifiedUserStore
+from storage import VerifiedUserStore
+
+# Reaction mode still handles the persistent verify button, so both paths can race for the same user.
+OVERRIDES = {
+    "SETTINGS.verification_type": "reaction",
+    "SETTINGS.enable_captcha": False,
+}
+
+def react(h: Harness, user_id: int, message_id: int):
+    h.state.parse_message_reaction_add({
+        "user_id": str(user_id),
+        "channel_id": str(VERIFY_CHANNEL_ID),
+        "message_id": str(message_id),
+        "guild_id": str(GUILD_ID),
+        "emoji": {"id": None, "name": "✅"},
+        "member": member_payload(user_id, [UNVERIFIED_ROLE_ID]),
+        "burst": False,
+        "type": 0,
+    })
+
+async def compact_continuously(data_manager, stop: asyncio.Event):
+    compactions = 0
+    while not stop.is_set():
+        await data_manager.compact()
+        compactions += 1
+        await asyncio.sleep(0.01)
+    return compactions
+
+def stored_ids(workdir: str, shared: bool) -> list:
+    if shared:
+        store = SharedVerifiedUserStore(SharedStore(os.path.join(workdir, "data", "shared.db")), GUILD_ID)
+        ids = [int(record["id"]) for record in store.iter_all()]
+        store.shared.close()
+        return ids
+    # Count raw snapshot and journal entries too, since loading the store would fold duplicates away.
+    store = VerifiedUserStore(os.path.join(workdir, "data", "verified_users.json"))
+    ids = [int(record["id"]) for record in store._read_snapshot()]
+    for path in (store.rotated_journal_path, store.journal_path):
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                ids.extend(int(json.loads(line)["id"]) for line in f if line.strip())
+    return ids
+
+async def run_mode(main_module, args, shared: bool, workdir: str) -> bool:
+    overrides = {**OVERRIDES, "SHARDING.enabled": shared, "SHARDING.shared_store": "data/shared.db"}
+    fake = FakeDiscord(args.latency, args.jitter, args.rate_limit)
+    fake.start()
+    errors = ErrorCounter()
+    logging.getLogger().handlers = [errors]
+    h = Harness(main_module, fake, overrides, workdir)
+    try:
+        await h.start()
+        context = h.bot.guild_registry.contexts[GUILD_ID]
+        message_id = context.verification_message_id
+        stop = asyncio.Event()
+        compactor = asyncio.create_task(compact_continuously(context.data_manager, stop))
+
+        started = time.perf_counter()
+        tokens = []
+        for i in range(args.users):
+            user_id = FIRST_USER_ID + i
+            # Two clicks and a reaction per user, back to back, as a double click racing a reaction would arrive.
+            for _ in range(args.clicks):
+                tokens.append(f"token-{h.click(user_id)}")
+                h.expect(("followup", tokens[-1]))
+            react(h, user_id, message_id)
+            await asyncio.sleep(0)
+        drained = await h.wait(args.drain_timeout)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        compactions = await compactor
+        coalesced = h.bot.coalesced_verifications
+    finally:
+        await h.stop()
+        fake.stop()
+
+    role_adds = [h.seen[("role", FIRST_USER_ID + i, VERIFY_ROLE_ID)] for i in range(args.users)]
+    replies = [h.seen[("followup", token)] for token in tokens]
+    ids = stored_ids(workdir, shared)
+    stored = set(ids)
+    missing = sum(1 for i in range(args.users) if FIRST_USER_ID + i not in stored)
+    duplicates = len(ids) - len(stored)
+    checks = {
+        "every user got the verify role once": all(count == 1 for count in role_adds),
+        "every click got exactly one reply": drained and all(count == 1 for count in replies),
+        "no verified user lost from the store": missing == 0,
+        "no duplicate store records": duplicates == 0,
+        "no errors logged": errors.counts.get("ERROR", 0) == 0,
+    }
+    store_name = "shared SQLite store" if shared else "JSON snapshot + journal"
+    print(f"{store_name}: {args.users} users x ({args.clicks} clicks + 1 reaction) in {elapsed:.2f}s, "
+          f"{coalesced} coalesced, {compactions} concurrent compactions")
+    print(f"  role adds: {sum(role_adds)} ({sum(1 for c in role_adds if c > 1)} users twice, {role_adds.count(0)} never), "
+          f"replies: {sum(replies)}/{len(replies)}, stored: {len(stored)} ({missing} missing, {duplicates} duplicates), "
+          f"errors: {errors.counts.get('ERROR', 0)}")
+    for sample in errors.samples:
+        print(f"  error: {sample}")
+    for name, ok in checks.items():
+        print(f"  [{'ok' if ok else 'FAIL'}] {name}")
+    return all(checks.values())
+
+async def run(args) -> bool:
+    # main configures a bot.log file handler at import time, so import it from inside the scratch directory.
+    os.chdir(args.workdir)
+    import main
+    logging.getLogger("discord").setLevel(logging.WARNING)
+    ok = True
+    for shared in (False, True):
+        workdir = tempfile.mkdtemp(prefix="stress-", dir=args.workdir)
+        ok = await run_mode(main, args, shared, workdir) and ok
+    return ok
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Verify the same users concurrently and check that nothing is lost or repeated")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--clicks", type=int, default=2, help="button clicks per user, sent together with one reaction")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--rate-limit", type=float)
+    parser.add_argument("--drain-timeout", type=float, default=60)
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="verifybot-stress-") as workdir:
+        args.workdir = workdir
+        return 0 if asyncio.run(run(args)) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import random
+import secrets
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageDraw, ImageFilter, ImageFont
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Letters and digits that do not look alike once distorted.
+ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+
+class Challenge:
+    __slots__ = ("kind", "prompt", "image")
+
+    def __init__(self, kind: str, prompt: dict, image: bytes = None):
+        self.kind = kind
+        self.prompt = prompt
+        self.image = image
+
+def render_image_challenge(length: int = 5, width: int = 220, height: int = 80) -> tuple:
+    rng = random.Random(secrets.randbits(64))
+    answer = "".join(rng.choice(ALPHABET) for _ in range(length))
+    image = Image.new("RGB", (width, height), (rng.randint(220, 255), rng.randint(220, 255), rng.randint(220, 255)))
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.load_default(size=int(height * 0.55))
+    except TypeError:
+        font = ImageFont.load_default()
+
+    for _ in range(6):
+        draw.line(
+            [(rng.randint(0, width), rng.randint(0, height)), (rng.randint(0, width), rng.randint(0, height))],
+            fill=(rng.randint(80, 180), rng.randint(80, 180), rng.randint(80, 180)), width=2
+        )
+    step = width // (length + 1)
+    for i, char in enumerate(answer):
+        glyph = Image.new("RGBA", (step + 20, height), (0, 0, 0, 0))
+        ImageDraw.Draw(glyph).text((10, height * 0.15), char, font=font, fill=(rng.randint(0, 90), rng.randint(0, 90), rng.randint(0, 90)))
+        glyph = glyph.rotate(rng.uniform(-30, 30), resample=Image.BICUBIC, expand=False)
+        image.paste(glyph, (step // 2 + i * step + rng.randint(-4, 4), rng.randint(-6, 6)), glyph)
+    for _ in range(width * height // 40):
+        draw.point((rng.randrange(width), rng.randrange(height)), fill=(rng.randint(0, 200),) * 3)
+    image = image.filter(ImageFilter.SMOOTH)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return answer, buffer.getvalue()
+
+class MathProvider:
+    kind = "math"
+
+    async def generate(self) -> tuple:
+        num1, num2 = random.randint(1, 20), random.randint(1, 20)
+        return str(num1 + num2), Challenge(self.kind, {"num1": num1, "num2": num2})
+
+    def normalize(self, answer: str) -> str:
+        answer = answer.strip()
+        if not answer.isdigit():
+            raise ValueError(answer)
+        return str(int(answer))
+
+class ImageProvider:
+    kind = "image"
+
+    def __init__(self, settings: dict):
+        self.length = settings.get("length", 5)
+        self.width = settings.get("width", 220)
+        self.height = settings.get("height", 80)
+        self.pool_size = settings.get("pool_size", 50)
+        self.workers = settings.get("workers", 2)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self.pool = deque(maxlen=self.pool_size)
+        self.refill_task = None
+        self.refill_event = asyncio.Event()
+        self.misses = 0
+
+    async def render(self) -> tuple:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, render_image_challenge, self.length, self.width, self.height
+        )
+
+    async def generate(self) -> tuple:
+        if self.pool:
+            answer, image = self.pool.popleft()
+        else:
+            self.misses += 1
+            answer, image = await self.render()
+        self.refill_event.set()
+        return answer, Challenge(self.kind, {"length": self.length}, image)
+
+    def normalize(self, answer: str) -> str:
+        return answer.strip().upper()
+
+    def start(self):
+        if self.refill_task is None:
+            self.refill_event.set()
+            self.refill_task = asyncio.create_task(self._refill_loop())
+
+    async def _refill_loop(self):
+        while True:
+            await self.refill_event.wait()
+            self.refill_event.clear()
+            try:
+                # Refilling a few images at a time leaves a worker free, so a render for a pool miss never queues behind a whole refill.
+                while len(self.pool) < self.pool_size:
+                    batch = min(max(1, self.workers - 1), self.pool_size - len(self.pool))
+                    self.pool.extend(await asyncio.gather(*(self.render() for _ in range(batch))))
+            except Exception as e:
+                logger.error(f"Could not pregenerate captcha images: {e}")
+                await asyncio.sleep(5)
+                self.refill_event.set()
+
+    def stop(self):
+        if self.refill_task:
+            self.refill_task.cancel()
+            self.refill_task = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class CaptchaEngine:
+    PASSED, INCORRECT, INVALID, EXPIRED = "passed", "incorrect", "invalid", "expired"
+
+    def __init__(self, settings: dict = None):
+        settings = settings or {}
+        self.settings = settings
+        self.max_challenges = settings.get("max_challenges", 100000)
+        self.providers = {"math": MathProvider()}
+        # (guild_id, user_id) -> (kind, answer, expires_at); nothing else is kept per challenge.
+        self.challenges = {}
+        self.expired = 0
+
+    def provider(self, kind: str):
+        if kind == "image" and "image" not in self.providers:
+            if Image is None:
+                logger.warning("Pillow is not installed, using math captchas instead of image captchas")
+                self.providers["image"] = self.providers["math"]
+            else:
+                self.providers["image"] = ImageProvider(self.settings)
+                self.providers["image"].start()
+        return self.providers.get(kind, self.providers["math"])
+
+    def warm(self, kinds: set):
+        # Starting the image workers at boot keeps process spawn out of the first click's acknowledgement window.
+        for kind in kinds:
+            self.provider(kind)
+
+    def ready(self, kind: str) -> bool:
+        provider = self.provider(kind)
+        return not isinstance(provider, ImageProvider) or bool(provider.pool)
+
+    async def issue(self, guild_id: int, user_id: int, kind: str = "math", timeout: float = 300) -> Challenge:
+        provider = self.provider(kind)
+        answer, challenge = await provider.generate()
+        if len(self.challenges) >= self.max_challenges:
+            self.prune()
+        self.challenges[(guild_id, user_id)] = (provider.kind, answer, time.monotonic() + timeout)
+        return challenge
+
+    def check(self, guild_id: int, user_id: int, answer: str) -> str:
+        entry = self.challenges.get((guild_id, user_id))
+        if entry is None or entry[2] <= time.monotonic():
+            self.challenges.pop((guild_id, user_id), None)
+            return self.EXPIRED
+        kind, expected, _ = entry
+        try:
+            answer = self.providers[kind].normalize(answer)
+        except ValueError:
+            return self.INVALID
+        del self.challenges[(guild_id, user_id)]
+        return self.PASSED if secrets.compare_digest(answer, expected) else self.INCORRECT
+
+    def prune(self):
+        now = time.monotonic()
+        expired = [key for key, entry in self.challenges.items() if entry[2] <= now]
+        for key in expired:
+            del self.challenges[key]
+        self.expired += len(expired)
+        while len(self.challenges) >= self.max_challenges:
+            del self.challenges[next(iter(self.challenges))]
+
+    def stats(self) -> dict:
+        image = self.providers.get("image")
+        return {
+            "pending": len(self.challenges),
+            "expired": self.expired,
+            "image_pool": len(image.pool) if isinstance(image, ImageProvider) else 0,
+            "image_pool_misses": image.misses if isinstance(image, ImageProvider) else 0,
+        }
+
+    def stop(self):
+        for provider in self.providers.values():
+            if isinstance(provider, ImageProvider):
+                provider.stop()
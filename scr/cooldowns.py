@@ -0,0 +1,105 @@
+import heapq
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+COOLDOWN_UNTIL, WINDOW_UNTIL, ATTEMPTS = 0, 1, 2
+
+class VerificationLimiter:
+    def __init__(self, cooldown: float = 30, max_attempts: int = 3, attempt_window: float = 300, max_entries: int = 100000):
+        self.cooldown = cooldown
+        self.max_attempts = max_attempts
+        self.attempt_window = attempt_window
+        self.max_entries = max_entries
+        self.entries = {}
+        self.heap = []
+        self.evictions = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "heap_size": len(self.heap),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
+
+    def _entry(self, user_id: int, now: float):
+        entry = self.entries.get(user_id)
+        if entry is not None and max(entry[COOLDOWN_UNTIL], entry[WINDOW_UNTIL]) <= now:
+            del self.entries[user_id]
+            self.expired += 1
+            return None
+        return entry
+
+    def _touch(self, user_id: int, entry: list, now: float):
+        self.entries[user_id] = entry
+        heapq.heappush(self.heap, (max(entry[COOLDOWN_UNTIL], entry[WINDOW_UNTIL]), user_id))
+        self.prune(now)
+
+    def prune(self, now: float = None):
+        now = time.monotonic() if now is None else now
+        heap = self.heap
+        while heap:
+            expires_at, user_id = heap[0]
+            entry = self.entries.get(user_id)
+            if entry is None or max(entry[COOLDOWN_UNTIL], entry[WINDOW_UNTIL]) != expires_at:
+                heapq.heappop(heap)
+                continue
+            if expires_at <= now:
+                heapq.heappop(heap)
+                del self.entries[user_id]
+                self.expired += 1
+                continue
+            if len(self.entries) > self.max_entries:
+                heapq.heappop(heap)
+                del self.entries[user_id]
+                self.evictions += 1
+                continue
+            break
+
+        if len(heap) > 2 * len(self.entries) + 64:
+            self.heap = [(max(e[COOLDOWN_UNTIL], e[WINDOW_UNTIL]), uid) for uid, e in self.entries.items()]
+            heapq.heapify(self.heap)
+
+    def cooldown_remaining(self, user_id: int) -> int:
+        now = time.monotonic()
+        entry = self._entry(user_id, now)
+        if entry is None:
+            return 0
+        return max(0, int(entry[COOLDOWN_UNTIL] - now + 0.999))
+
+    def locked_remaining(self, user_id: int) -> int:
+        now = time.monotonic()
+        entry = self._entry(user_id, now)
+        if entry is None or entry[ATTEMPTS] < self.max_attempts:
+            return 0
+        return max(0, int(entry[WINDOW_UNTIL] - now + 0.999))
+
+    def start_cooldown(self, user_id: int):
+        now = time.monotonic()
+        entry = self._entry(user_id, now) or [0.0, 0.0, 0]
+        entry[COOLDOWN_UNTIL] = now + self.cooldown
+        self._touch(user_id, entry, now)
+
+    def record_failure(self, user_id: int) -> int:
+        now = time.monotonic()
+        entry = self._entry(user_id, now) or [0.0, 0.0, 0]
+        if entry[WINDOW_UNTIL] <= now:
+            entry[WINDOW_UNTIL] = now + self.attempt_window
+            entry[ATTEMPTS] = 0
+        entry[ATTEMPTS] += 1
+        self._touch(user_id, entry, now)
+        return max(0, self.max_attempts - entry[ATTEMPTS])
+
+    def reset_attempts(self, user_id: int):
+        entry = self.entries.get(user_id)
+        if entry is not None:
+            entry[WINDOW_UNTIL] = 0.0
+            entry[ATTEMPTS] = 0
+            self._touch(user_id, entry, time.monotonic())
@@ -0,0 +1,170 @@
+import logging
+from datetime import datetime, timezone
+import discord
+from utils import Colors, LanguageManager
+
+logger = logging.getLogger(__name__)
+
+class EmbedTemplates:
+    def __init__(self, lang: LanguageManager, server_name: str, links: dict, default_lang: str = None):
+        self.lang = lang
+        self.default_lang = default_lang
+        self.server_name = server_name
+        self.links = links
+        self.templates = {}
+        self.replies = {}
+
+    def invalidate(self):
+        self.templates.clear()
+        self.replies.clear()
+
+    def warm(self, langs: list = None):
+        for lang in langs or list(self.lang.tables):
+            for name in ("verify_success", "welcome_back", "user_verified", "auto_restoration", "reply_footer"):
+                self._template(name, lang)
+        logger.info(f"Prebuilt {len(self.templates)} embed templates")
+
+    def _template(self, name: str, lang: str = None) -> discord.Embed:
+        lang = lang or self.default_lang or self.lang.default_lang
+        template = self.templates.get((lang, name))
+        if template is None:
+            template = self.templates[(lang, name)] = getattr(self, f"_build_{name}")(lang)
+        return template
+
+    def _build_verify_success(self, lang: str) -> discord.Embed:
+        embed = discord.Embed(
+            title=self.lang.get("dm_notifications.verify_success.title", lang),
+            description=self.lang.get("dm_notifications.verify_success.description", lang, server_name=self.server_name),
+            color=Colors.SUCCESS
+        )
+        embed.add_field(
+            name=self.lang.get("dm_notifications.verify_success.features_title", lang),
+            value=self.lang.get("dm_notifications.verify_success.features_content", lang),
+            inline=False
+        )
+        if self.links.get("server_icon"):
+            embed.set_thumbnail(url=self.links["server_icon"])
+        embed.set_footer(text=self.lang.get("dm_notifications.verify_success.footer", lang, server_name=self.server_name))
+        return embed
+
+    def _build_welcome_back(self, lang: str) -> discord.Embed:
+        embed = discord.Embed(
+            title=self.lang.get("dm_notifications.welcome_back.title", lang),
+            description=self.lang.get("dm_notifications.welcome_back.description", lang, server_name=self.server_name),
+            color=Colors.SUCCESS
+        )
+        embed.add_field(
+            name=self.lang.get("dm_notifications.welcome_back.status_title", lang),
+            value=self.lang.get("dm_notifications.welcome_back.status_content", lang),
+            inline=False
+        )
+        if self.links.get("server_icon"):
+            embed.set_thumbnail(url=self.links["server_icon"])
+        embed.set_footer(text=self.lang.get("dm_notifications.welcome_back.footer", lang, server_name=self.server_name))
+        return embed
+
+    def _build_user_verified(self, lang: str) -> discord.Embed:
+        return discord.Embed(title=self.lang.get("logging.user_verified.title", lang), color=Colors.SUCCESS)
+
+    def _build_auto_restoration(self, lang: str) -> discord.Embed:
+        return discord.Embed(title=self.lang.get("logging.auto_restoration.title", lang), color=Colors.INFO)
+
+    def _build_verify_reminder(self, lang: str) -> discord.Embed:
+        embed = discord.Embed(title=self.lang.get("dm_notifications.verify_reminder.title", lang), color=Colors.WARNING)
+        if self.links.get("server_icon"):
+            embed.set_thumbnail(url=self.links["server_icon"])
+        embed.set_footer(text=self.lang.get("dm_notifications.verify_reminder.footer", lang, server_name=self.server_name))
+        return embed
+
+    def _build_unverified_kick(self, lang: str) -> discord.Embed:
+        return discord.Embed(title=self.lang.get("logging.unverified_kick.title", lang), color=Colors.WARNING)
+
+    def _build_captcha_image(self, lang: str) -> discord.Embed:
+        embed = discord.Embed(
+            title=self.lang.get("captcha.title", lang),
+            description=self.lang.get("captcha.image_prompt", lang),
+            color=Colors.INFO
+        )
+        return embed.set_image(url="attachment://captcha.png")
+
+    def _build_reply_footer(self, lang: str) -> discord.Embed:
+        return discord.Embed().set_footer(text=self.lang.get("welcome_embed.footer", lang, server_name=self.server_name))
+
+    def verify_success_dm(self, lang: str = None) -> discord.Embed:
+        return self._template("verify_success", lang)
+
+    def welcome_back_dm(self, lang: str = None) -> discord.Embed:
+        return self._template("welcome_back", lang)
+
+    def verify_reminder_dm(self, channel_id: int = None, kick_at: int = None, lang: str = None) -> discord.Embed:
+        embed = self._template("verify_reminder", lang).copy()
+        embed.description = self.lang.get(
+            "dm_notifications.verify_reminder.description", lang,
+            server_name=self.server_name,
+            channel=f"<#{channel_id}>" if channel_id else self.server_name
+        )
+        if kick_at:
+            embed.add_field(
+                name=self.lang.get("dm_notifications.verify_reminder.deadline_title", lang),
+                value=self.lang.get("dm_notifications.verify_reminder.deadline_content", lang, timestamp=kick_at),
+                inline=False
+            )
+        return embed
+
+    def captcha_image(self, lang: str = None) -> discord.Embed:
+        return self._template("captcha_image", lang).copy()
+
+    def user_verified_log(self, user, method: str, timestamp: int, lang: str = None) -> discord.Embed:
+        lang = lang or self.default_lang
+        embed = self._template("user_verified", lang).copy()
+        embed.description = self.lang.get(
+            "logging.user_verified.description", lang,
+            user_mention=user.mention,
+            user_name=str(user),
+            method=method,
+            timestamp=timestamp
+        )
+        return embed
+
+    def auto_restoration_log(self, member, previous_timestamp: int, method: str, lang: str = None) -> discord.Embed:
+        lang = lang or self.default_lang
+        embed = self._template("auto_restoration", lang).copy()
+        embed.description = self.lang.get(
+            "logging.auto_restoration.description", lang,
+            user_mention=member.mention,
+            user_name=str(member),
+            previous_timestamp=previous_timestamp,
+            method=method
+        )
+        return embed
+
+    def unverified_kick_log(self, member, joined_timestamp: int, lang: str = None) -> discord.Embed:
+        lang = lang or self.default_lang
+        embed = self._template("unverified_kick", lang).copy()
+        embed.description = self.lang.get(
+            "logging.unverified_kick.description", lang,
+            user_mention=member.mention,
+            user_name=str(member),
+            joined_timestamp=joined_timestamp
+        )
+        return embed
+
+    def reply(self, description: str, color: int, title: str = None, lang: str = None) -> discord.Embed:
+        embed = self._template("reply_footer", lang).copy()
+        embed.description = description
+        embed.colour = color
+        if title:
+            embed.title = title
+        embed.timestamp = datetime.now(timezone.utc)
+        return embed
+
+    def status_reply(self, key: str, color: int, lang: str = None, **kwargs) -> discord.Embed:
+        lang = lang or self.default_lang or self.lang.default_lang
+        if kwargs:
+            return self.reply(self.lang.get(key, lang, **kwargs), color, lang=lang)
+        template = self.replies.get((lang, key, color))
+        if template is None:
+            template = self.replies[(lang, key, color)] = self.reply(self.lang.get(key, lang), color, lang=lang)
+        embed = template.copy()
+        embed.timestamp = datetime.now(timezone.utc)
+        return embed
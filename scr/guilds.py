@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from utils import Config, DataManager, LanguageManager
+from embeds import EmbedTemplates
+from cooldowns import VerificationLimiter
+from log_sink import LogSink
+from shared_store import SharedStore, SharedVerifiedUserStore, SharedVerificationLimiter
+
+logger = logging.getLogger(__name__)
+
+class GuildContext:
+    def __init__(self, guild_id: int, guild_config: dict, data_manager: DataManager, lang: LanguageManager, shared_store: SharedStore = None):
+        self.guild_id = guild_id
+        self.data_manager = data_manager
+        self.shared_store = shared_store
+        self.limiter = None
+        self.apply_config(guild_config, lang)
+        if shared_store:
+            self.limiter = SharedVerificationLimiter(
+                shared_store, guild_id,
+                cooldown=self.settings.get("verification_cooldown", 30),
+                max_attempts=self.settings.get("max_verification_attempts", 3),
+                attempt_window=self.settings.get("verification_timeout", 300)
+            )
+        else:
+            self.limiter = VerificationLimiter(
+                cooldown=self.settings.get("verification_cooldown", 30),
+                max_attempts=self.settings.get("max_verification_attempts", 3),
+                attempt_window=self.settings.get("verification_timeout", 300),
+                max_entries=self.settings.get("max_tracked_users", 100000)
+            )
+        self.log_sink = None
+        self.reconciler = None
+        self.in_flight = 0
+        self.cached_sizes = (0, 0)
+        self.on_touch = None
+        self.last_used = time.monotonic()
+
+    def apply_config(self, guild_config: dict, lang: LanguageManager):
+        self.config = guild_config
+        self.server_name = guild_config.get("SERVER_NAME")
+        self.links = guild_config.get("LINKS", {})
+        self.settings = guild_config.get("SETTINGS", {})
+        self.language = self.settings.get("default_language", lang.default_lang)
+        if self.language not in lang.tables:
+            self.language = lang.default_lang
+        self.channel_ids = {name: int(cid) for name, cid in guild_config.get("CHANNELS", {}).items() if cid}
+        self.role_ids = {name: int(rid) for name, rid in guild_config.get("ROLES", {}).items() if rid}
+        self.embeds = EmbedTemplates(lang, self.server_name, self.links, self.language)
+        limiter = self.limiter
+        if limiter is not None:
+            limiter.cooldown = self.settings.get("verification_cooldown", 30)
+            limiter.max_attempts = self.settings.get("max_verification_attempts", 3)
+            limiter.attempt_window = self.settings.get("verification_timeout", 300)
+            if hasattr(limiter, "max_entries"):
+                limiter.max_entries = self.settings.get("max_tracked_users", 100000)
+
+    def touch(self):
+        self.last_used = time.monotonic()
+        if self.on_touch:
+            self.on_touch(self.guild_id)
+
+    @property
+    def busy(self) -> bool:
+        return self.reconciler is not None or self.in_flight > 0
+
+    async def run_limiter(self, func, *args):
+        # Shared cooldowns live in SQLite, where a write can wait on another process's lock.
+        if self.shared_store:
+            return await self.data_manager.writer.run(func, *args)
+        return func(*args)
+
+    def sizes(self) -> tuple:
+        # Counting the shared store is a SQLite query, so metrics read the counts cached by the maintenance loop.
+        if self.shared_store:
+            return self.cached_sizes
+        return len(self.limiter), len(self.data_manager.store)
+
+    async def refresh_sizes(self):
+        if self.shared_store:
+            self.cached_sizes = await self.data_manager.writer.run(lambda: (len(self.limiter), len(self.data_manager.store)))
+
+    def role(self, guild, name: str):
+        role_id = self.role_ids.get(name)
+        return guild.get_role(role_id) if role_id else None
+
+    def channel(self, client, name: str):
+        channel_id = self.channel_ids.get(name)
+        return client.get_channel(channel_id) if channel_id else None
+
+    @property
+    def verification_message_id(self):
+        return self.data_manager.state.get("verification_message_id")
+
+    async def close(self):
+        if self.log_sink:
+            await self.log_sink.stop()
+            self.log_sink = None
+        await self.data_manager.unload_store()
+
+class GuildRegistry:
+    def __init__(self, bot, config: Config, data_manager: DataManager, shared_store: SharedStore = None):
+        self.bot = bot
+        self.config = config
+        self.data_manager = data_manager
+        self.shared_store = shared_store
+        registry_config = config.get("GUILD_REGISTRY", {})
+        self.idle_timeout = registry_config.get("idle_timeout", 1800)
+        self.max_active = registry_config.get("max_active", 1000)
+        self.maintenance_interval = registry_config.get("maintenance_interval", 60)
+        self.guild_configs = {}
+        self.default_guild_id = None
+        self.contexts = OrderedDict()
+        self.locks = {}
+        self.message_guilds = {}
+        self.evictions = 0
+        self.task = None
+        self.load_guild_configs()
+
+    def load_guild_configs(self):
+        self.base_config = base = {
+            "SERVER_NAME": self.config.get("SERVER_NAME"),
+            "CHANNELS": self.config.get("CHANNELS", {}),
+            "ROLES": self.config.get("ROLES", {}),
+            "LINKS": self.config.get("LINKS", {}),
+            "SETTINGS": self.config.get("SETTINGS", {}),
+        }
+        self.guild_configs = {}
+        self.default_guild_id = self.config.get("GUILD_ID") or None
+        if self.default_guild_id:
+            self.guild_configs[int(self.default_guild_id)] = base
+
+        for guild_id, overrides in self.config.get("GUILDS", {}).items():
+            self.guild_configs[int(guild_id)] = {
+                "SERVER_NAME": overrides.get("SERVER_NAME", base["SERVER_NAME"]),
+                "CHANNELS": overrides.get("CHANNELS", {}),
+                "ROLES": overrides.get("ROLES", {}),
+                "LINKS": {**base["LINKS"], **overrides.get("LINKS", {})},
+                "SETTINGS": {**base["SETTINGS"], **overrides.get("SETTINGS", {})},
+            }
+        logger.info(f"Configured {len(self.guild_configs)} guilds")
+
+    async def reload(self):
+        previous = self.base_config, self.guild_configs, self.default_guild_id
+        try:
+            self.load_guild_configs()
+            if previous[2] and self.default_guild_id != previous[2]:
+                # The default guild owns the bot-wide data manager, so a new GUILD_ID only takes effect after a restart.
+                # Without GUILD_ID it was found from the verify channel at startup and is kept the same way.
+                if self.default_guild_id and str(self.default_guild_id) not in self.config.get("GUILDS", {}):
+                    self.guild_configs.pop(int(self.default_guild_id), None)
+                self.default_guild_id = previous[2]
+                self.guild_configs[self.default_guild_id] = self.base_config
+            for guild_id, context in list(self.contexts.items()):
+                guild_config = self.guild_configs.get(guild_id)
+                if guild_config is None:
+                    await self.evict(guild_id)
+                    continue
+                context.apply_config(guild_config, self.bot.lang)
+                context.embeds.warm([context.language])
+        except Exception:
+            self.base_config, self.guild_configs, self.default_guild_id = previous
+            for guild_id, context in self.contexts.items():
+                if guild_id in self.guild_configs:
+                    context.apply_config(self.guild_configs[guild_id], self.bot.lang)
+            raise
+
+    def set_default_guild(self, guild_id: int):
+        if guild_id in self.guild_configs:
+            return
+        self.default_guild_id = guild_id
+        self.guild_configs[guild_id] = self.base_config
+
+    def is_configured(self, guild_id: int) -> bool:
+        return guild_id in self.guild_configs
+
+    def _data_manager_for(self, guild_id: int) -> DataManager:
+        if guild_id == self.default_guild_id:
+            return self.data_manager
+        data_config = self.config.get("DATA", {})
+        folder = os.path.join(data_config.get("folder", "data"), str(guild_id))
+        verified_users_file = os.path.join(folder, "verified_users.json")
+        store = SharedVerifiedUserStore(self.shared_store, guild_id, verified_users_file) if self.shared_store else None
+        return DataManager(self.config, {
+            **data_config,
+            "folder": folder,
+            "verified_users_file": verified_users_file,
+            "verified_users_journal": None,
+            "state_file": os.path.join(folder, "state.json"),
+        }, writer=self.data_manager.writer, store=store)
+
+    async def get(self, guild_id: int, load_store: bool = True):
+        if guild_id is None or guild_id not in self.guild_configs:
+            return None
+        context = self.contexts.get(guild_id)
+        if context is None:
+            lock = self.locks.setdefault(guild_id, asyncio.Lock())
+            async with lock:
+                context = self.contexts.get(guild_id)
+                if context is None:
+                    context = await self._open(guild_id)
+        context.touch()
+        if load_store and not context.data_manager.store_loaded:
+            async with self.locks.setdefault(guild_id, asyncio.Lock()):
+                await context.data_manager.load_store()
+        return context
+
+    async def _open(self, guild_id: int) -> GuildContext:
+        data_manager = self._data_manager_for(guild_id)
+        if data_manager is not self.data_manager:
+            await data_manager.load_state()
+        context = GuildContext(guild_id, self.guild_configs[guild_id], data_manager, self.bot.lang, self.shared_store)
+        context.embeds.warm([context.language])
+        context.log_sink = LogSink(
+            lambda: context.channel(self.bot, "log"),
+            lambda count, seconds: self.bot.create_log_summary_embed(count, seconds, context.language),
+            self.config.get("LOG_SINK", {})
+        )
+        context.log_sink.start()
+        context.on_touch = self.touch
+        if context.verification_message_id:
+            self.message_guilds[context.verification_message_id] = guild_id
+        self.contexts[guild_id] = context
+        logger.info(f"Opened guild context {guild_id} ({len(self.contexts)} active)")
+        if len(self.contexts) > self.max_active:
+            # Busy contexts are skipped, so the limit can be exceeded until their reconciliation or verifications finish.
+            for oldest_id in list(self.contexts)[:-1]:
+                if await self.evict(oldest_id):
+                    break
+        return context
+
+    def touch(self, guild_id: int):
+        if guild_id in self.contexts:
+            self.contexts.move_to_end(guild_id)
+
+    async def evict(self, guild_id: int, force: bool = False) -> bool:
+        context = self.contexts.get(guild_id)
+        if context is None or (context.busy and not force):
+            return False
+        del self.contexts[guild_id]
+        await context.close()
+        self.evictions += 1
+        logger.info(f"Evicted idle guild context {guild_id} ({len(self.contexts)} active)")
+        return True
+
+    def active(self) -> list:
+        return list(self.contexts.values())
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._maintenance_loop())
+
+    async def _maintenance_loop(self):
+        while True:
+            await asyncio.sleep(self.maintenance_interval)
+            now = time.monotonic()
+            for guild_id, context in list(self.contexts.items()):
+                try:
+                    if guild_id not in self.guild_configs or now - context.last_used >= self.idle_timeout:
+                        await self.evict(guild_id)
+                    else:
+                        await context.run_limiter(context.limiter.prune)
+                        await context.refresh_sizes()
+                        await context.data_manager.maybe_compact()
+                except Exception as e:
+                    logger.error(f"Maintenance failed for guild {guild_id}: {e}")
+            self.bot.dm_dispatcher.prune()
+            try:
+                await self.bot.pending.maybe_compact()
+            except Exception as e:
+                logger.error(f"Could not compact pending members: {e}")
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        for guild_id in list(self.contexts):
+            await self.evict(guild_id, force=True)
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+from collections import deque
+import discord
+from pipeline import RouteRateLimiter
+
+logger = logging.getLogger(__name__)
+
+MAX_EMBEDS_PER_MESSAGE = 10
+
+class LogSink:
+    def __init__(self, get_channel, summary_factory, settings: dict = None):
+        settings = settings or {}
+        self.get_channel = get_channel
+        self.summary_factory = summary_factory
+        self.batch_size = max(1, min(MAX_EMBEDS_PER_MESSAGE, settings.get("batch_size", MAX_EMBEDS_PER_MESSAGE)))
+        self.flush_interval = settings.get("flush_interval", 5)
+        self.max_buffer = settings.get("max_buffer", 200)
+        self.limiter = RouteRateLimiter(settings.get("message_rate", 5), settings.get("message_per", 5))
+        self.buffer = deque()
+        self.overflow = 0
+        self.window_started = time.monotonic()
+        self.wake = asyncio.Event()
+        self.task = None
+        self.metrics = {"queued": 0, "flushed": 0, "dropped": 0, "messages": 0, "failed": 0}
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        await self.flush()
+
+    def push(self, embed: discord.Embed):
+        if len(self.buffer) >= self.max_buffer:
+            self.overflow += 1
+            self.metrics["dropped"] += 1
+            return
+        self.buffer.append(embed)
+        self.metrics["queued"] += 1
+        if len(self.buffer) >= self.batch_size:
+            self.wake.set()
+
+    def stats(self) -> dict:
+        return {**self.metrics, "buffered": len(self.buffer), "overflow": self.overflow}
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing log channel batch: {e}")
+
+    def _take_batch(self) -> list:
+        batch = []
+        while self.buffer and len(batch) < self.batch_size:
+            batch.append(self.buffer.popleft())
+        if self.overflow and not self.buffer and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            seconds = max(1, int(time.monotonic() - self.window_started))
+            batch.append(self.summary_factory(self.overflow, seconds))
+            self.overflow = 0
+        return batch
+
+    async def flush(self):
+        channel = self.get_channel()
+        if not channel:
+            if self.buffer:
+                self.metrics["dropped"] += len(self.buffer)
+                self.buffer.clear()
+            self.overflow = 0
+            return
+
+        route = f"channel_messages:{channel.id}"
+        while self.buffer or self.overflow:
+            batch = self._take_batch()
+            if not batch:
+                break
+            await self.limiter.acquire(route)
+            try:
+                await channel.send(embeds=batch)
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    self.limiter.penalize(route, float(e.response.headers.get("Retry-After", 1)))
+                    self.buffer.extendleft(reversed(batch))
+                    continue
+                self.metrics["failed"] += len(batch)
+                logger.error(f"Could not send log batch to {channel}: {e}")
+                continue
+            self.metrics["flushed"] += len(batch)
+            self.metrics["messages"] += 1
+        self.window_started = time.monotonic()
@@ -1,7 +1,24 @@
 import discord
+from discord import app_commands
+import asyncio
 import logging
-from datetime import datetime, timezone
-from utils import Config, DataManager, LanguageManager, Colors, create_verify_view
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from utils import Config, DataManager, LanguageManager, Colors, create_verify_view, gateway_options, send_ephemeral
+from pipeline import JoinPipeline
+from embeds import EmbedTemplates
+from analytics import GuildAnalytics
+from metrics import Metrics, LoopLagMonitor, MetricsServer
+from guilds import GuildRegistry
+from shared_store import SharedStore, SharedVerifiedUserStore
+from sharding import ShardHealth, ShardCluster, shard_for_guild
+from reconcile import Reconciler
+from captcha import CaptchaEngine
+from notifications import DMDispatcher
+from pending import PendingScheduler
+from reloader import ConfigReloader
+from startup import BootTimer
 
 logging.basicConfig(
     level=logging.INFO,
@@ -10,290 +27,667 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+INTERACTION_TOKEN_LIFETIME = timedelta(minutes=14)
+
 class VerificationBot(discord.Client):
-    def __init__(self):
-        super().__init__(intents=discord.Intents.all())
-        self.config = Config()
-        self.data_manager = DataManager(self.config)
+    def __init__(self, process_index: int = 0, config: Config = None, **client_options):
+        boot = BootTimer()
+        with boot.stage("config"):
+            config = config or Config()
+        super().__init__(**gateway_options(config), **client_options)
+        self.boot = boot
+        self.config = config
+        self.process_index = process_index
+        with boot.stage("data"):
+            sharding_config = self.config.get("SHARDING", {})
+            self.shared_store = SharedStore(sharding_config.get("shared_store", "data/shared.db")) if sharding_config.get("enabled") else None
+            store = None
+            if self.shared_store:
+                store = SharedVerifiedUserStore(
+                    self.shared_store,
+                    int(self.config.get("GUILD_ID") or 0),
+                    self.config.get("DATA", {}).get("verified_users_file", "data/verified_users.json")
+                )
+            self.data_manager = DataManager(self.config, store=store)
         
         default_lang = self.config.get("SETTINGS", {}).get("default_language", "en")
-        self.lang = LanguageManager(default_lang)
+        guild_langs = {guild.get("SETTINGS", {}).get("default_language") for guild in self.config.get("GUILDS", {}).values()}
+        with boot.stage("languages"):
+            self.lang = LanguageManager(default_lang, codes={"en", default_lang, *guild_langs} - {None})
         
         if default_lang not in self.lang.languages:
             logger.error(f"Default language '{default_lang}' not loaded! Falling back to 'en'")
             self.lang.default_lang = "en"
         
-        self.verification_cooldowns = {}
-        self.verification_message_id = None
-        self.analytics = {"total_verifications": 0, "daily_stats": {}, "verification_methods": {}}
+        self.verification_messages_ready = set()
+        self.analytics = GuildAnalytics()
+        self.analytics_file = self.config.get("DATA", {}).get("analytics_file", "data/analytics.json")
+        if process_index:
+            root, ext = os.path.splitext(self.analytics_file)
+            self.analytics_file = f"{root}.{process_index}{ext}"
+        self.analytics_loaded = False
+        self.analytics_task = None
+        pending_file = self.config.get("DATA", {}).get("pending_members_file", "data/pending_members.json")
+        if process_index:
+            root, ext = os.path.splitext(pending_file)
+            pending_file = f"{root}.{process_index}{ext}"
+        self.pending = PendingScheduler(self, pending_file, self.config.get("PENDING_MEMBERS", {}))
+        self.tree = app_commands.CommandTree(self)
+        metrics_config = self.config.get("METRICS", {})
+        self.metrics = Metrics(enabled=metrics_config.get("enabled", False))
+        self.loop_lag = LoopLagMonitor(metrics_config.get("loop_lag_interval", 0.5))
+        self.metrics_server = None
         self.guild_name = self.config.get("SERVER_NAME")
         self.channels = self.config.get("CHANNELS", {})
-        self.roles = self.config.get("ROLES", {})
         self.links = self.config.get("LINKS", {})
         self.settings = self.config.get("SETTINGS", {})
-        self.guild = None
+        self.embeds = EmbedTemplates(self.lang, self.guild_name, self.links)
+        self.captcha = CaptchaEngine(self.config.get("CAPTCHA", {}))
+        self.dm_dispatcher = DMDispatcher(self.config.get("DM_NOTIFICATIONS", {}))
+        self.guild_registry = GuildRegistry(self, self.config, self.data_manager, self.shared_store)
+        self.join_pipeline = None
+        self.verifications = {}
+        self.coalesced_verifications = 0
+        reload_config = self.config.get("RELOAD", {})
+        self.reloader = ConfigReloader(self, reload_config) if reload_config.get("enabled", True) else None
 
-    def create_embed(self, description: str, color: int, title: str = None) -> discord.Embed:
-        embed = discord.Embed(description=description, color=color, timestamp=datetime.now(timezone.utc))
-        if title:
-            embed.title = title
-        embed.set_footer(text=self.lang.get("welcome_embed.footer", server_name=self.guild_name))
+    async def setup_hook(self):
+        with self.boot.stage("state"):
+            await self.data_manager.load_state()
+        with self.boot.stage("handlers"):
+            self.add_view(create_verify_view(self))
+            self.embeds.warm()
+            self.add_commands()
+            self.captcha.warm(self.captcha_types())
+            self.join_pipeline = JoinPipeline(self.process_member_join, self.config.get("JOIN_PIPELINE", {}))
+            self.join_pipeline.start()
+            self.dm_dispatcher.start()
+            self.guild_registry.start()
+            if self.reloader:
+                self.reloader.start()
+            self.analytics_task = self.loop.create_task(self.analytics_flush_loop())
+            if self.metrics.enabled:
+                await self.start_metrics()
+        self.boot.mark("handlers_ready")
+        # Nothing below is needed to answer an interaction, so it loads while the gateway connects.
+        self.boot.background("languages_remaining", self.lang.load_remaining())
+        self.boot.background("analytics", self.load_analytics())
+        self.boot.background("guild_contexts", self.open_guild_contexts())
+        self.boot.background("command_sync", self.sync_commands())
+        self.boot.background("pending_members", self.pending.start())
+        if self.config.get("DATA", {}).get("preload_verified_users", True):
+            self.boot.background("verified_users", self.preload_verified_users())
+
+    def captcha_types(self) -> set:
+        settings = [self.settings, *(guild["SETTINGS"] for guild in self.guild_registry.guild_configs.values())]
+        return {s.get("captcha_type", "math") for s in settings if s.get("enable_captcha", True)}
+
+    async def load_analytics(self):
+        default_guild_id = self.guild_registry.default_guild_id
+        self.analytics.load(await self.data_manager.load_json(self.analytics_file, {}), int(default_guild_id) if default_guild_id else None)
+        self.analytics_loaded = True
+
+    async def open_guild_contexts(self):
+        # Opening a context maps its stored verification message to the guild, so reactions are handled before on_ready.
+        for guild_id in list(self.guild_registry.guild_configs):
+            if self.owns_guild(guild_id):
+                await self.guild_registry.get(guild_id, load_store=False)
+
+    async def preload_verified_users(self):
+        default_guild_id = self.guild_registry.default_guild_id
+        if default_guild_id and self.owns_guild(int(default_guild_id)):
+            await self.guild_registry.get(int(default_guild_id))
+
+    async def start_metrics(self):
+        metrics_config = self.config.get("METRICS", {})
+        self.loop_lag.start()
+        self.metrics.gauge("event_loop_lag_seconds", lambda: self.loop_lag.lag)
+        self.metrics.gauge("event_loop_lag_max_seconds", lambda: self.loop_lag.max_lag)
+        self.metrics.gauge("join_queue_depth", lambda: self.join_pipeline.queue.qsize())
+        self.metrics.gauge("join_deferred_depth", lambda: len(self.join_pipeline.deferred))
+        self.metrics.gauge("join_raid_mode", lambda: self.join_pipeline.raid_mode)
+        self.metrics.gauge("join_processed_total", lambda: self.join_pipeline.metrics["processed"])
+        self.metrics.gauge("active_guilds", lambda: len(self.guild_registry.contexts))
+        self.metrics.gauge("guild_evictions_total", lambda: self.guild_registry.evictions)
+        self.metrics.gauge("log_buffer_depth", lambda: sum(len(c.log_sink.buffer) for c in self.guild_registry.active() if c.log_sink))
+        self.metrics.gauge("log_dropped_total", lambda: sum(c.log_sink.metrics["dropped"] for c in self.guild_registry.active() if c.log_sink))
+        self.metrics.gauge("limiter_tracked_users", lambda: sum(c.sizes()[0] for c in self.guild_registry.active()))
+        self.metrics.gauge("limiter_evictions_total", lambda: sum(c.limiter.evictions for c in self.guild_registry.active()))
+        self.metrics.gauge("limiter_expired_total", lambda: sum(c.limiter.expired for c in self.guild_registry.active()))
+        self.metrics.gauge("verified_users_loaded", lambda: sum(c.sizes()[1] for c in self.guild_registry.active()))
+        self.metrics.gauge("captcha_pending", lambda: len(self.captcha.challenges))
+        self.metrics.gauge("captcha_image_pool", lambda: self.captcha.stats()["image_pool"])
+        self.metrics.gauge("captcha_image_pool_misses_total", lambda: self.captcha.stats()["image_pool_misses"])
+        self.metrics.gauge("verifications_in_flight", lambda: len(self.verifications))
+        self.metrics.gauge("verifications_coalesced_total", lambda: self.coalesced_verifications)
+        self.metrics.gauge("dm_queue_depth", lambda: self.dm_dispatcher.queue.qsize())
+        self.metrics.gauge("dm_forbidden_cached", lambda: len(self.dm_dispatcher.forbidden))
+        self.metrics.gauge("dm_notifications_total", lambda: {
+            f'result="{key}"': self.dm_dispatcher.metrics[key]
+            for key in ("sent", "failed", "retries", "forbidden", "skipped_forbidden", "skipped_duplicate", "dropped")
+        })
+        self.metrics.gauge("pending_members", lambda: len(self.pending.queue))
+        self.metrics.gauge("pending_members_total", lambda: {f'result="{key}"': value for key, value in self.pending.metrics.items()})
+        if self.reloader:
+            self.metrics.gauge("config_reloads_total", lambda: {f'result="{key}"': value for key, value in self.reloader.metrics.items()})
+        self.metrics.gauge("gateway_latency_seconds", lambda: self.latency)
+        self.metrics.gauge("boot_stage_seconds", lambda: {f'stage="{name}"': value for name, value in self.boot.stages.items()})
+        self.metrics.gauge("boot_milestone_seconds", lambda: {f'milestone="{name}"': value for name, value in self.boot.marks.items()})
+        port = metrics_config.get("port", 9108) + self.process_index
+        self.metrics_server = MetricsServer(self.metrics, metrics_config.get("host", "127.0.0.1"), port)
+        try:
+            await self.metrics_server.start()
+        except OSError as e:
+            logger.error(f"Could not start metrics endpoint: {e}")
+            self.metrics_server = None
+
+    async def close(self):
+        self.boot.stop()
+        self.loop_lag.stop()
+        if self.reloader:
+            self.reloader.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        if self.join_pipeline:
+            await self.join_pipeline.stop()
+        await self.dm_dispatcher.stop()
+        await self.pending.stop()
+        await self.guild_registry.close()
+        self.captcha.stop()
+        if self.analytics_task:
+            self.analytics_task.cancel()
+            await self.flush_analytics()
+        await self.data_manager.close()
+        if self.shared_store:
+            self.shared_store.close()
+        await super().close()
+
+    async def apply_config(self, data: dict):
+        previous = self.config.data, self.lang.default_lang
+        self.config.data = data
+        default_lang = data.get("SETTINGS", {}).get("default_language", "en")
+        self.lang.default_lang = default_lang if default_lang in self.lang.tables else "en"
+        try:
+            await self.guild_registry.reload()
+        except Exception:
+            # The registry has rolled its own state back, so the bot keeps running on the previous configuration.
+            self.config.data, self.lang.default_lang = previous
+            raise
+        self.guild_name = data.get("SERVER_NAME")
+        self.channels = data.get("CHANNELS", {})
+        self.links = data.get("LINKS", {})
+        self.settings = data.get("SETTINGS", {})
+        self.embeds = EmbedTemplates(self.lang, self.guild_name, self.links)
+        self.embeds.warm()
+        self.captcha.warm(self.captcha_types())
+        if self.is_ready():
+            await self.sync_commands()
+        if self.pending.queue.loaded:
+            await self.pending.reschedule()
+        if self.is_ready():
+            await self.refresh_verification_messages()
+
+    async def refresh_verification_messages(self):
+        for context in self.guild_registry.active():
+            state = context.data_manager.state
+            if (state.get("verification_channel_id") == context.channel_ids.get("verify")
+                    and state.get("verification_type") == context.settings.get("verification_type", "button")):
+                continue
+            guild = self.get_guild(context.guild_id)
+            if guild and self.owns_guild(guild.id):
+                self.verification_messages_ready.discard(guild.id)
+                if await self.setup_verification_message(context, guild):
+                    self.verification_messages_ready.add(guild.id)
+
+    def owns_guild(self, guild_id: int) -> bool:
+        return True
+
+    async def flush_analytics(self):
+        # Until the saved rollups are merged in, writing would replace them with only this run's counts.
+        if self.analytics.dirty and self.analytics_loaded:
+            self.analytics.dirty = False
+            await self.data_manager.save_json(self.analytics_file, self.analytics.to_dict())
+
+    async def analytics_flush_loop(self):
+        interval = self.config.get("DATA", {}).get("analytics_flush_interval", 60)
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush_analytics()
+
+    def add_commands(self):
+        @self.tree.command(name="verification-stats", description="Show verification statistics")
+        @app_commands.default_permissions(manage_guild=True)
+        @app_commands.guild_only()
+        async def verification_stats(interaction: discord.Interaction):
+            context = await self.guild_registry.get(interaction.guild_id, load_store=False)
+            if not context:
+                await interaction.response.send_message(
+                    embed=self.embeds.status_reply("errors.guild_not_found", Colors.ERROR), ephemeral=True
+                )
+                return
+            await interaction.response.send_message(embed=self.create_stats_embed(context), ephemeral=True)
+
+        @self.tree.command(name="verification-reconcile", description="Sync verification roles with the verified-user store")
+        @app_commands.describe(dry_run="Only count the changes that would be made", restart="Ignore any saved checkpoint and start over")
+        @app_commands.default_permissions(manage_guild=True)
+        @app_commands.guild_only()
+        async def verification_reconcile(interaction: discord.Interaction, dry_run: bool = False, restart: bool = False):
+            await self.reconcile_guild(interaction, dry_run, restart)
+
+    async def sync_commands(self):
+        signature = sorted(f"{c.name}:{c.description}" for c in self.tree.get_commands())
+        if not self.guild_registry.guild_configs:
+            # Without GUILD_ID or GUILDS the commands are registered globally, once.
+            if self.process_index == 0:
+                await self.sync_command_target(None, self.data_manager, signature)
+            return
+        # Each process registers the commands in the guilds on its own shards.
+        for guild_id in list(self.guild_registry.guild_configs):
+            if self.owns_guild(guild_id):
+                context = await self.guild_registry.get(guild_id, load_store=False)
+                if context:
+                    await self.sync_command_target(discord.Object(id=guild_id), context.data_manager, signature)
+
+    async def sync_command_target(self, target, data_manager: DataManager, signature: list):
+        if data_manager.state.get("synced_commands") == signature:
+            return
+        try:
+            if target:
+                self.tree.copy_global_to(guild=target)
+            await self.tree.sync(guild=target)
+            await data_manager.update_state(synced_commands=signature)
+            logger.info(f"Synced {len(signature)} application commands to {f'guild {target.id}' if target else 'all guilds'}")
+        except discord.HTTPException as e:
+            logger.error(f"Could not sync application commands to {f'guild {target.id}' if target else 'all guilds'}: {e}")
+
+    def create_stats_embed(self, context) -> discord.Embed:
+        # Only the calling guild's own numbers, in its language.
+        summary = self.analytics.guild(context.guild_id).summary()
+        lang = context.language
+        none = self.lang.get("analytics.none", lang)
+        embed = context.embeds.reply(
+            f"**{self.lang.get('analytics.total', lang)}:** {summary['total_verifications']}",
+            Colors.INFO,
+            self.lang.get("analytics.title", lang)
+        )
+        embed.add_field(
+            name=self.lang.get("analytics.recent", lang),
+            value=self.lang.get(
+                "analytics.recent_content", lang,
+                minute=summary["last_minute"], hour=summary["last_hour"], day=summary["last_day"], week=summary["last_week"]
+            ),
+            inline=False
+        )
+        embed.add_field(
+            name=self.lang.get("analytics.latency", lang),
+            value=self.lang.get("analytics.latency_content", lang, p50=summary["latency_ms_p50"], p99=summary["latency_ms_p99"])
+            if summary["latency_ms_p50"] is not None else none
+        )
+        embed.add_field(
+            name=self.lang.get("analytics.captcha", lang),
+            value=f"{summary['captcha_pass_rate']:.0%}" if summary["captcha_pass_rate"] is not None else none
+        )
+        embed.add_field(
+            name=self.lang.get("analytics.join_to_verify", lang),
+            value=self.lang.get("analytics.join_to_verify_content", lang, seconds=summary["join_to_verify_s_p50"])
+            if summary["join_to_verify_s_p50"] is not None else none
+        )
+        embed.add_field(
+            name=self.lang.get("analytics.methods", lang),
+            value="\n".join(f"{method.title()}: {count}" for method, count in summary["methods"].items()) or none,
+            inline=False
+        )
         return embed
 
+    async def reconcile_guild(self, interaction: discord.Interaction, dry_run: bool, restart: bool):
+        context = await self.guild_registry.get(interaction.guild_id)
+        if not context:
+            await interaction.response.send_message(
+                embed=self.embeds.status_reply("errors.guild_not_found", Colors.ERROR), ephemeral=True
+            )
+            return
+        if context.reconciler:
+            await interaction.response.send_message(
+                embed=context.embeds.status_reply("reconcile.already_running", Colors.WARNING), ephemeral=True
+            )
+            return
+
+        reconciler = Reconciler(
+            context, interaction.guild, self.join_pipeline.limiter, self.config.get("RECONCILE", {}), dry_run,
+            progress=lambda r, final: update(self.create_reconcile_embed(context, r, final))
+        )
+        if not restart:
+            reconciler.load_checkpoint()
+        # Claimed before the first await, so a second invocation arriving meanwhile sees the run.
+        context.reconciler = reconciler
+        message = None
+
+        async def update(embed: discord.Embed):
+            nonlocal message
+            # Interaction tokens expire after 15 minutes, so longer runs report in a regular message instead.
+            if discord.utils.utcnow() - interaction.created_at < INTERACTION_TOKEN_LIFETIME:
+                await interaction.edit_original_response(embed=embed)
+            elif message:
+                await message.edit(embed=embed)
+            else:
+                message = await (context.channel(self, "log") or interaction.channel).send(embed=embed)
+
+        try:
+            await interaction.response.defer(ephemeral=True, thinking=True)
+            stats = await reconciler.run()
+            log_channel_id = context.channel_ids.get("log")
+            if log_channel_id and not dry_run and (message is None or message.channel.id != log_channel_id):
+                context.log_sink.push(self.create_reconcile_embed(context, reconciler, True))
+            logger.info(f"Reconciliation of guild {interaction.guild_id} finished: {stats}")
+        except Exception as e:
+            logger.error(f"Reconciliation of guild {interaction.guild_id} stopped: {e}")
+            try:
+                await update(context.embeds.status_reply("reconcile.failed", Colors.ERROR, error=e))
+            except discord.HTTPException:
+                pass
+        finally:
+            context.reconciler = None
+
+    def create_reconcile_embed(self, context, reconciler: Reconciler, final: bool) -> discord.Embed:
+        lang = context.language
+        if final:
+            description = self.lang.get("reconcile.finished", lang, scanned=reconciler.stats["scanned"], elapsed=reconciler.elapsed())
+        else:
+            description = self.lang.get(
+                "reconcile.running", lang,
+                scanned=reconciler.stats["scanned"], total=reconciler.guild.member_count or "?", elapsed=reconciler.elapsed()
+            )
+        embed = discord.Embed(
+            title=self.lang.get("reconcile.title_dry_run" if reconciler.dry_run else "reconcile.title", lang),
+            description=description,
+            color=Colors.SUCCESS if final else Colors.INFO
+        )
+        embed.add_field(name=self.lang.get("reconcile.changes", lang), value=self.lang.get("reconcile.changes_content", lang, **reconciler.stats))
+        return embed
+
+    def create_embed(self, description: str, color: int, title: str = None) -> discord.Embed:
+        return self.embeds.reply(description, color, title)
+
+    def create_log_summary_embed(self, count: int, seconds: int, lang: str = None) -> discord.Embed:
+        return discord.Embed(
+            title=self.lang.get("logging.dropped_summary.title", lang),
+            description=self.lang.get("logging.dropped_summary.description", lang, count=count, seconds=seconds),
+            color=Colors.WARNING
+        )
+
+    async def on_interaction(self, interaction: discord.Interaction):
+        self.boot.mark("first_interaction")
+
     async def on_ready(self):
+        self.boot.mark("gateway_ready")
         logger.info(f"Bot logged in as {self.user}")
         logger.info(f"Connected to {len(self.guilds)} servers")
         
-        guild_id = self.config.get("GUILD_ID")
-        if guild_id:
-            self.guild = self.get_guild(guild_id)
-            if self.guild:
-                logger.info(f"Found guild: {self.guild.name} (ID: {guild_id})")
-            else:
-                logger.error(f"Guild with ID {guild_id} not found! Bot may not be in this server.")
-                return
-        else:
+        if not self.guild_registry.default_guild_id and not self.config.get("GUILDS"):
             logger.warning("GUILD_ID not set in config, trying to find from verify channel...")
             verify_channel_id = self.channels.get("verify")
             if verify_channel_id:
                 verify_channel = self.get_channel(verify_channel_id)
                 if verify_channel:
-                    self.guild = verify_channel.guild
-                    logger.info(f"Found guild from channel: {self.guild.name}")
+                    self.guild_registry.set_default_guild(verify_channel.guild.id)
+                    logger.info(f"Found guild from channel: {verify_channel.guild.name}")
                 else:
                     logger.error("Verify channel not found!")
             
-        if not self.guild:
-            logger.error("Could not determine guild. Please set GUILD_ID in config.json")
+        owned = [guild_id for guild_id in self.guild_registry.guild_configs if self.owns_guild(guild_id)]
+        if self.guild_registry.guild_configs and not owned:
+            logger.info("No configured guilds on this process's shards")
+            return
+        configured = [self.get_guild(guild_id) for guild_id in owned]
+        for guild_id, guild in zip(owned, configured):
+            if not guild:
+                logger.error(f"Guild with ID {guild_id} not found! Bot may not be in this server.")
+        configured = [guild for guild in configured if guild]
+        if not configured:
+            logger.error("Could not determine any guild. Please set GUILD_ID or GUILDS in config.json")
             return
             
-        logger.info("Bot is ready!")
-        await self.setup_verification_message()
+        logger.info(f"Bot is ready! Serving {len(configured)} configured guilds")
+        pending = [guild for guild in configured if guild.id not in self.verification_messages_ready]
+        with self.boot.stage("verification_messages"):
+            await asyncio.gather(*(self.prepare_verification_message(guild) for guild in pending))
 
-    async def setup_verification_message(self):
-        channel = self.get_channel(self.channels.get("verify"))
-        if not channel or not self.guild:
-            logger.error("Verify channel or guild not found in config.")
-            return
+    async def prepare_verification_message(self, guild):
+        try:
+            context = await self.guild_registry.get(guild.id, load_store=False)
+            if await self.setup_verification_message(context, guild):
+                self.verification_messages_ready.add(guild.id)
+        except discord.HTTPException as e:
+            logger.error(f"Could not set up the verification message in guild {guild.id}: {e}")
+
+    async def setup_verification_message(self, context, guild) -> bool:
+        channel = context.channel(self, "verify")
+        if not channel or channel.guild.id != guild.id:
+            logger.error(f"Verify channel for guild {guild.id} not found in config.")
+            return False
+        
+        settings = context.settings
+        verification_type = settings.get("verification_type", "button")
+        state = context.data_manager.state
+        message_id = state.get("verification_message_id")
+        if message_id and state.get("verification_channel_id") == channel.id and state.get("verification_type") == verification_type:
+            try:
+                await channel.fetch_message(message_id)
+                self.guild_registry.message_guilds[message_id] = guild.id
+                logger.info(f"Reusing existing verification message with ID: {message_id} in guild {guild.id}")
+                return True
+            except discord.NotFound:
+                logger.warning(f"Stored verification message {message_id} no longer exists, sending a new one")
+            except discord.HTTPException as e:
+                logger.error(f"Could not check stored verification message {message_id}: {e}")
+                return False
             
+        lang = context.language
         embed = discord.Embed(
-            title=self.lang.get("welcome_embed.title", server_name=self.guild_name),
-            description=self.lang.get("welcome_embed.description"),
+            title=self.lang.get("welcome_embed.title", lang, server_name=context.server_name),
+            description=self.lang.get("welcome_embed.description", lang),
             color=Colors.INFO
         ).add_field(
-            name=self.lang.get("welcome_embed.field_title"), 
-            value=self.lang.get("welcome_embed.field_content"), 
+            name=self.lang.get("welcome_embed.field_title", lang), 
+            value=self.lang.get("welcome_embed.field_content", lang), 
             inline=False
         )
         
-        if self.links.get("verify_image"):
-            embed.set_image(url=self.links["verify_image"])
+        if context.links.get("verify_image"):
+            embed.set_image(url=context.links["verify_image"])
         
-        thumbnail = self.links.get("thumbnail")
+        thumbnail = context.links.get("thumbnail")
         if thumbnail and thumbnail.lower() != "none":
             embed.set_thumbnail(url=thumbnail)
         
-        verification_type = self.settings.get("verification_type", "button")
         if verification_type == "button":
-            message = await channel.send(embed=embed, view=create_verify_view(self))
+            message = await channel.send(embed=embed, view=create_verify_view(self, context))
         elif verification_type == "reaction":
             message = await channel.send(embed=embed)
-            emoji = self.config.get("SETTINGS", {}).get("button_emoji", "✅")
+            emoji = settings.get("button_emoji", "✅")
             await message.add_reaction(emoji)
+        else:
+            logger.error(f"Unknown verification_type '{verification_type}' in config for guild {guild.id}")
+            return False
         
-        self.verification_message_id = message.id
-        logger.info(f"Verification message sent with ID: {message.id}")
+        self.guild_registry.message_guilds[message.id] = guild.id
+        await context.data_manager.update_state(
+            verification_message_id=message.id,
+            verification_channel_id=channel.id,
+            verification_type=verification_type
+        )
+        logger.info(f"Verification message sent with ID: {message.id} in guild {guild.id}")
+        return True
 
     async def on_raw_reaction_add(self, payload):
-        if self.settings.get("verification_type", "button") != "reaction":
-            return
-        if payload.message_id != self.verification_message_id:
+        guild_id = self.guild_registry.message_guilds.get(payload.message_id)
+        if guild_id is None or guild_id != payload.guild_id:
             return
         if payload.user_id == self.user.id:
             return
+        
+        context = await self.guild_registry.get(guild_id)
+        if not context or context.settings.get("verification_type", "button") != "reaction":
+            return
             
         guild = self.get_guild(payload.guild_id)
         if not guild:
             return
             
-        member = guild.get_member(payload.user_id)
+        member = payload.member or guild.get_member(payload.user_id)
         if not member:
-            return
+            try:
+                member = await guild.fetch_member(payload.user_id)
+            except discord.NotFound:
+                return
+            except discord.HTTPException as e:
+                logger.error(f"Could not fetch member {payload.user_id}: {e}")
+                return
             
-        expected_emoji = self.config.get("SETTINGS", {}).get("button_emoji", "✅")
+        expected_emoji = context.settings.get("button_emoji", "✅")
         if str(payload.emoji) == expected_emoji:
             await self.verify_user(member, guild, "reaction", None)
 
     async def verify_user(self, user, guild, source, interaction=None):
+        with self.metrics.span("verify_user"):
+            await self._verify_user(user, guild, source, interaction)
+
+    async def _verify_user(self, user, guild, source, interaction=None):
         if not guild:
             return
-            
+        
+        context = await self.guild_registry.get(guild.id)
+        if not context:
+            if interaction:
+                await send_ephemeral(interaction, self.embeds.status_reply("errors.guild_not_found", Colors.ERROR))
+            return
+
+        # Double clicks and a reaction racing a button press share one run instead of repeating the REST calls.
+        key = (guild.id, user.id)
+        task = self.verifications.get(key)
+        if task is None:
+            context.in_flight += 1
+            task = self.verifications[key] = asyncio.ensure_future(self._run_verification(context, user, guild, source))
+            task.add_done_callback(lambda _: self._finish_verification(key, context))
+        else:
+            self.coalesced_verifications += 1
+        reply_key, color, values = await asyncio.shield(task)
+
+        if interaction:
+            try:
+                with self.metrics.span("verify_user.interaction_reply"):
+                    await send_ephemeral(interaction, context.embeds.status_reply(reply_key, color, **values))
+            except discord.HTTPException as e:
+                logger.error(f"Could not reply to verification of {user}: {e}")
+
+    def _finish_verification(self, key: tuple, context):
+        self.verifications.pop(key, None)
+        context.in_flight -= 1
+
+    async def _run_verification(self, context, user, guild, source) -> tuple:
+        embeds = context.embeds
         try:
-            verify_role = guild.get_role(self.roles.get("verify"))
-            unverified_role = guild.get_role(self.roles.get("unverified"))
+            started = time.perf_counter()
+            verify_role = context.role(guild, "verify")
+            unverified_role = context.role(guild, "unverified")
 
             if not verify_role:
-                if interaction:
-                    await interaction.response.send_message(
-                        embed=self.create_embed(self.lang.get("verification.role_not_found"), Colors.ERROR), 
-                        ephemeral=True
-                    )
-                return
+                return "verification.role_not_found", Colors.ERROR, {}
 
             if verify_role in user.roles:
-                if interaction:
-                    await interaction.response.send_message(
-                        embed=self.create_embed(self.lang.get("verification.already_verified"), Colors.INFO), 
-                        ephemeral=True
-                    )
-                return
+                await self.pending.resolve(guild.id, user.id)
+                return "verification.already_verified", Colors.INFO, {}
+
+            locked = await context.run_limiter(context.limiter.locked_remaining, user.id)
+            if locked > 0:
+                return "verification.too_many_attempts", Colors.WARNING, {"seconds": locked}
 
-            cooldown = self.get_cooldown_remaining(user.id)
+            cooldown = await context.run_limiter(context.limiter.cooldown_remaining, user.id)
             if cooldown > 0:
-                if interaction:
-                    await interaction.response.send_message(
-                        embed=self.create_embed(
-                            self.lang.get("verification.cooldown_message", seconds=cooldown), 
-                            Colors.WARNING
-                        ), 
-                        ephemeral=True
-                    )
-                return
+                return "verification.cooldown_message", Colors.WARNING, {"seconds": cooldown}
 
-            self.verification_cooldowns[user.id] = datetime.now(timezone.utc)
+            await context.run_limiter(context.limiter.start_cooldown, user.id)
             
             roles_to_add = [verify_role] if verify_role else []
             roles_to_remove = [unverified_role] if unverified_role and unverified_role in user.roles else []
 
             if roles_to_remove:
-                await user.remove_roles(*roles_to_remove, reason=f"Verified via {source}")
+                with self.metrics.span("verify_user.role_remove"):
+                    await user.remove_roles(*roles_to_remove, reason=f"Verified via {source}")
                 
             if roles_to_add:
-                await user.add_roles(*roles_to_add, reason=f"Verified via {source}")
-
-            users = self.data_manager.get_verified_users()
-            if not any(u["id"] == user.id for u in users):
-                users.append({
-                    "id": user.id, 
-                    "name": str(user), 
-                    "verified_at": str(datetime.now(timezone.utc)), 
-                    "method": source
-                })
-                self.data_manager.save_verified_users(users)
-                
-                self.analytics["total_verifications"] += 1
-                today = str(datetime.now(timezone.utc).date())
-                self.analytics["daily_stats"][today] = self.analytics["daily_stats"].get(today, 0) + 1
-                self.analytics["verification_methods"][source] = self.analytics["verification_methods"].get(source, 0) + 1
-
-            if self.settings.get("enable_dm_notifications", True):
-                try:
-                    embed = discord.Embed(
-                        title=self.lang.get("dm_notifications.verify_success.title"), 
-                        description=self.lang.get("dm_notifications.verify_success.description", server_name=self.guild_name), 
-                        color=Colors.SUCCESS
-                    )
-                    embed.add_field(
-                        name=self.lang.get("dm_notifications.verify_success.features_title"), 
-                        value=self.lang.get("dm_notifications.verify_success.features_content"), 
-                        inline=False
-                    )
-                    if self.links.get("server_icon"):
-                        embed.set_thumbnail(url=self.links["server_icon"])
-                    embed.set_footer(text=self.lang.get("dm_notifications.verify_success.footer", server_name=self.guild_name))
-                    await user.send(embed=embed)
-                except discord.Forbidden:
-                    logger.warning(f"Could not send DM to {user}")
+                with self.metrics.span("verify_user.role_add"):
+                    await user.add_roles(*roles_to_add, reason=f"Verified via {source}")
 
-            if interaction:
-                await interaction.response.send_message(
-                    embed=self.create_embed(self.lang.get("verification.successful"), Colors.SUCCESS), 
-                    ephemeral=True
+            await context.run_limiter(context.limiter.reset_attempts, user.id)
+            with self.metrics.span("verify_user.store_write"):
+                added = await context.data_manager.add_verified_user(user, source)
+            if added:
+                joined_at = getattr(user, "joined_at", None)
+                self.analytics.guild(context.guild_id).record_verification(
+                    source,
+                    latency_ms=(time.perf_counter() - started) * 1000,
+                    join_to_verify_s=(datetime.now(timezone.utc) - joined_at).total_seconds() if joined_at else None
                 )
+
+            if context.settings.get("enable_dm_notifications", True):
+                with self.metrics.span("verify_user.dm_enqueue"):
+                    self.dm_dispatcher.push(user, embeds.verify_success_dm(), "verify_success", context.guild_id)
             
-            log_channel = self.get_channel(self.channels.get("log"))
-            if log_channel:
-                log_embed = discord.Embed(
-                    title=self.lang.get("logging.user_verified.title"),
-                    description=self.lang.get("logging.user_verified.description", 
-                                            user_mention=user.mention, 
-                                            user_name=str(user), 
-                                            method=source.title(), 
-                                            timestamp=int(datetime.now(timezone.utc).timestamp())),
-                    color=Colors.SUCCESS
-                )
-                await log_channel.send(embed=log_embed)
+            if context.channel_ids.get("log"):
+                with self.metrics.span("verify_user.log_enqueue"):
+                    log_embed = embeds.user_verified_log(user, source.title(), int(datetime.now(timezone.utc).timestamp()))
+                    context.log_sink.push(log_embed)
+
+            await self.pending.resolve(guild.id, user.id)
+            return "verification.successful", Colors.SUCCESS, {}
                 
         except discord.Forbidden:
-            if interaction:
-                await interaction.response.send_message(
-                    embed=self.create_embed(self.lang.get("verification.failed"), Colors.ERROR), 
-                    ephemeral=True
-                )
             logger.error(f"Missing permissions to verify {user}")
         except Exception as e:
             logger.error(f"Error during verification: {e}")
-            if interaction and not interaction.response.is_done():
-                await interaction.response.send_message(
-                    embed=self.create_embed(self.lang.get("verification.failed"), Colors.ERROR), 
-                    ephemeral=True
-                )
-
-    def get_cooldown_remaining(self, user_id: int) -> int:
-        if user_id not in self.verification_cooldowns:
-            return 0
-        elapsed = (datetime.now(timezone.utc) - self.verification_cooldowns[user_id]).total_seconds()
-        return max(0, int(self.settings.get("verification_cooldown", 30) - elapsed))
+        return "verification.failed", Colors.ERROR, {}
 
     async def on_member_join(self, member):
-        if member.guild != self.guild:
+        if not self.guild_registry.is_configured(member.guild.id):
+            return
+        with self.metrics.span("on_member_join.enqueue"):
+            await self.join_pipeline.submit(member)
+
+    async def add_roles_paced(self, member, *roles, reason: str = None):
+        route = f"member_roles:{member.guild.id}"
+        with self.metrics.span("on_member_join.rate_limit_wait"):
+            await self.join_pipeline.limiter.acquire(route)
+        try:
+            with self.metrics.span("on_member_join.role_add"):
+                await member.add_roles(*roles, reason=reason)
+        except discord.HTTPException as e:
+            if e.status == 429:
+                self.join_pipeline.limiter.penalize(route, float(e.response.headers.get("Retry-After", 1)))
+            raise
+
+    async def process_member_join(self, member):
+        with self.metrics.span("on_member_join.process"):
+            await self._process_member_join(member)
+
+    async def _process_member_join(self, member):
+        context = await self.guild_registry.get(member.guild.id)
+        if not context:
             return
             
-        if self.settings.get("auto_role_restoration", True):
-            verified_users = self.data_manager.get_verified_users()
-            user_data = next((u for u in verified_users if u["id"] == member.id), None)
+        if context.settings.get("auto_role_restoration", True):
+            user_data = await context.data_manager.get_verified_user(member.id)
             
             if user_data:
-                verify_role = member.guild.get_role(self.roles.get("verify"))
+                verify_role = context.role(member.guild, "verify")
                 
                 roles_to_add = [verify_role] if verify_role else []
                 
                 if roles_to_add:
                     try:
-                        await member.add_roles(*roles_to_add, reason="Auto role restoration - previously verified")
+                        await self.add_roles_paced(member, *roles_to_add, reason="Auto role restoration - previously verified")
                         logger.info(f"Restored roles for returning verified user: {member}")
-                        
-                        if self.settings.get("enable_dm_notifications", True):
-                            try:
-                                embed = discord.Embed(
-                                    title=self.lang.get("dm_notifications.welcome_back.title"),
-                                    description=self.lang.get("dm_notifications.welcome_back.description", server_name=self.guild_name),
-                                    color=Colors.SUCCESS
-                                )
-                                embed.add_field(
-                                    name=self.lang.get("dm_notifications.welcome_back.status_title"),
-                                    value=self.lang.get("dm_notifications.welcome_back.status_content"),
-                                    inline=False
-                                )
-                                if self.links.get("server_icon"):
-                                    embed.set_thumbnail(url=self.links["server_icon"])
-                                embed.set_footer(text=self.lang.get("dm_notifications.welcome_back.footer", server_name=self.guild_name))
-                                await member.send(embed=embed)
-                            except discord.Forbidden:
-                                logger.warning(f"Could not send welcome back DM to {member}")
-                        
-                        log_channel = self.get_channel(self.channels.get("log"))
-                        if log_channel:
-                            log_embed = discord.Embed(
-                                title=self.lang.get("logging.auto_restoration.title"),
-                                description=self.lang.get("logging.auto_restoration.description", 
-                                                        user_mention=member.mention, 
-                                                        user_name=str(member), 
-                                                        previous_timestamp=int(datetime.fromisoformat(user_data['verified_at'].replace('Z', '+00:00')).timestamp()),
-                                                        method=user_data.get('method', 'Unknown')),
-                                color=Colors.INFO
-                            )
-                            await log_channel.send(embed=log_embed)
+                        await self.join_pipeline.dispatch(lambda: self.announce_restoration(context, member, user_data))
                     except discord.Forbidden:
                         logger.error(f"Missing permissions to restore roles for {member}")
                     except Exception as e:
@@ -301,32 +695,123 @@ class VerificationBot(discord.Client):
                 
                 return
         
-        unverified_role = member.guild.get_role(self.roles.get("unverified"))
+        await self.pending.track(member.guild.id, member.id, context.settings, member.joined_at.timestamp() if member.joined_at else None)
+        unverified_role = context.role(member.guild, "unverified")
         if unverified_role:
             try:
-                await member.add_roles(unverified_role, reason="Auto-assigned on join")
+                await self.add_roles_paced(member, unverified_role, reason="Auto-assigned on join")
                 logger.info(f"Added unverified role to new member: {member}")
             except discord.Forbidden:
                 logger.error(f"Missing permissions to add unverified role to {member}")
             except Exception as e:
                 logger.error(f"Error adding unverified role to {member}: {e}")
 
-def main():
-    bot = VerificationBot()
-    token = bot.config.get("TOKEN")
-    
-    if not token or token == "YOUR_DISCORD_BOT_TOKEN":
-        print("Please configure your bot token in config.json")
-        print("Get your token from: https://discord.com/developers/applications")
-        return
+    async def on_raw_member_remove(self, payload):
+        if self.guild_registry.is_configured(payload.guild_id):
+            await self.pending.resolve(payload.guild_id, payload.user.id)
+
+    async def announce_restoration(self, context, member, user_data: dict):
+        if context.settings.get("enable_dm_notifications", True):
+            self.dm_dispatcher.push(member, context.embeds.welcome_back_dm(), "welcome_back", context.guild_id)
+        
+        if context.channel_ids.get("log") and context.log_sink:
+            log_embed = context.embeds.auto_restoration_log(
+                member,
+                int(datetime.fromisoformat(user_data['verified_at'].replace('Z', '+00:00')).timestamp()),
+                user_data.get('method', 'Unknown')
+            )
+            context.log_sink.push(log_embed)
+
+class ShardedVerificationBot(VerificationBot, discord.AutoShardedClient):
+    def __init__(self, process_index: int = 0, **client_options):
+        super().__init__(process_index, **client_options)
+        self.shard_health = ShardHealth()
+        self.health_task = None
+
+    def owns_guild(self, guild_id: int) -> bool:
+        if self.shard_ids is None:
+            return True
+        return shard_for_guild(guild_id, self.shard_count) in self.shard_ids
+
+    async def setup_hook(self):
+        await super().setup_hook()
+        self.health_task = self.loop.create_task(self.shard_health_loop())
+
+    async def start_metrics(self):
+        self.metrics.gauge("shard_latency_seconds", lambda: {
+            f'shard="{row["shard_id"]}"': row["latency"] for row in self.shard_health.snapshot(self) if row["latency"] is not None
+        })
+        self.metrics.gauge("shard_reconnects_total", lambda: {
+            f'shard="{shard_id}"': entry["reconnects"] for shard_id, entry in self.shard_health.shards.items()
+        })
+        await super().start_metrics()
+
+    async def on_shard_connect(self, shard_id: int):
+        self.shard_health.mark(shard_id, "connected")
+
+    async def on_shard_ready(self, shard_id: int):
+        self.shard_health.mark(shard_id, "ready")
+        logger.info(f"Shard {shard_id} ready")
+
+    async def on_shard_disconnect(self, shard_id: int):
+        self.shard_health.mark(shard_id, "disconnected")
+        logger.warning(f"Shard {shard_id} disconnected")
+
+    async def on_shard_resumed(self, shard_id: int):
+        self.shard_health.mark(shard_id, "resumed")
+        logger.info(f"Shard {shard_id} resumed")
+
+    async def shard_health_loop(self):
+        interval = self.config.get("SHARDING", {}).get("health_interval", 30)
+        while True:
+            await asyncio.sleep(interval)
+            rows = self.shard_health.snapshot(self)
+            try:
+                await self.data_manager.writer.run(self.shared_store.record_shard_health, self.process_index, rows)
+            except Exception as e:
+                logger.error(f"Could not record shard health: {e}")
+            for row in rows:
+                latency = f"{row['latency'] * 1000:.0f}ms" if row["latency"] is not None else "n/a"
+                logger.debug(f"Shard {row['shard_id']}: {row['status']}, latency {latency}, {row['reconnects']} reconnects")
+
+    async def close(self):
+        if self.health_task:
+            self.health_task.cancel()
+            self.health_task = None
+        await super().close()
+
+def run_bot(process_index: int = 0, shard_ids: list = None, shard_count: int = None):
+    config = Config()
+    sharding_config = config.get("SHARDING", {})
+    if sharding_config.get("enabled"):
+        bot = ShardedVerificationBot(
+            process_index, config=config, shard_ids=shard_ids, shard_count=shard_count or sharding_config.get("shard_count")
+        )
+    else:
+        bot = VerificationBot(config=config)
         
     try:
-        bot.run(token)
+        bot.run(config.get("TOKEN"))
     except discord.LoginFailure:
         print("Invalid bot token! Check config.json")
     except Exception as e:
         logger.error(f"Bot crashed: {e}")
         print(f"Bot crashed: {e}")
 
+def main():
+    config = Config()
+    token = config.get("TOKEN")
+    
+    if not token or token == "YOUR_DISCORD_BOT_TOKEN":
+        print("Please configure your bot token in config.json")
+        print("Get your token from: https://discord.com/developers/applications")
+        return
+    
+    sharding_config = config.get("SHARDING", {})
+    if sharding_config.get("enabled") and sharding_config.get("processes", 1) > 1:
+        ShardCluster(run_bot, config, token).run()
+    else:
+        run_bot()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from array import array
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, error=exc_type is not None)
+        return False
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count", "errors")
+
+    def __init__(self, size: int):
+        self.counts = array("L", [0] * size)
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+
+class Metrics:
+    def __init__(self, enabled: bool = False, prefix: str = "verifybot", buckets: tuple = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def span(self, name: str):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def observe(self, name: str, seconds: float, error: bool = False):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = _Histogram(len(self.buckets) + 1)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        histogram.counts[i] += 1
+        histogram.sum += seconds
+        histogram.count += 1
+        if error:
+            histogram.errors += 1
+
+    def inc(self, name: str, amount: float = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name: str, source):
+        self.gauges[name] = source
+
+    def render(self) -> str:
+        lines = []
+        if self.histograms:
+            name = f"{self.prefix}_stage_duration_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+            errors = f"{self.prefix}_stage_errors_total"
+            lines.append(f"# TYPE {errors} counter")
+            for stage, histogram in sorted(self.histograms.items()):
+                lines.append(f'{errors}{{stage="{stage}"}} {histogram.errors}')
+        for counter, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {self.prefix}_{counter} counter")
+            lines.append(f"{self.prefix}_{counter} {value}")
+        for gauge, source in sorted(self.gauges.items()):
+            try:
+                value = source() if callable(source) else source
+            except Exception as e:
+                logger.warning(f"Could not read gauge {gauge}: {e}")
+                continue
+            lines.append(f"# TYPE {self.prefix}_{gauge} gauge")
+            if isinstance(value, dict):
+                lines.extend(f"{self.prefix}_{gauge}{{{labels}}} {float(v)}" for labels, v in sorted(value.items()))
+            else:
+                lines.append(f"{self.prefix}_{gauge} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.max_lag = max(self.max_lag, self.lag)
+
+class MetricsServer:
+    def __init__(self, metrics: Metrics, host: str = "127.0.0.1", port: int = 9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                body = self.metrics.render().encode("utf-8")
+                status, content_type = "200 OK", "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                body = b"not found\n"
+                status, content_type = "404 Not Found", "text/plain; charset=utf-8"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug("Metrics request failed: %s", e)
+        finally:
+            writer.close()
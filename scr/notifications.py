@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import random
+import time
+import discord
+from pipeline import RouteRateLimiter
+
+logger = logging.getLogger(__name__)
+
+DM_ROUTE = "dm"
+
+class DMDispatcher:
+    def __init__(self, settings: dict = None):
+        settings = settings or {}
+        self.queue = asyncio.Queue(maxsize=settings.get("queue_size", 5000))
+        self.worker_count = settings.get("workers", 2)
+        self.max_retries = settings.get("max_retries", 3)
+        self.retry_base = settings.get("retry_base", 1.0)
+        self.retry_max = settings.get("retry_max", 30.0)
+        self.forbidden_ttl = settings.get("forbidden_ttl", 86400)
+        self.forbidden_cache_size = settings.get("forbidden_cache_size", 100000)
+        self.dedupe_window = settings.get("dedupe_window", 300)
+        self.drain_timeout = settings.get("drain_timeout", 5)
+        self.limiter = RouteRateLimiter(settings.get("dm_rate", 5), settings.get("dm_per", 5))
+        # user_id -> monotonic time until which DMs to that user are not attempted.
+        self.forbidden = {}
+        # (user_id, guild_id, key) -> monotonic time of the last queued notification, pending or sent.
+        self.recent = {}
+        self.tasks = []
+        self.metrics = {
+            "queued": 0,
+            "sent": 0,
+            "failed": 0,
+            "retries": 0,
+            "forbidden": 0,
+            "skipped_forbidden": 0,
+            "skipped_duplicate": 0,
+            "dropped": 0,
+        }
+
+    def start(self):
+        if self.tasks:
+            return
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        if self.tasks and not self.queue.empty():
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=self.drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping {self.queue.qsize()} queued DMs on shutdown")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def push(self, user, embed: discord.Embed, key: str = None, guild_id: int = None) -> bool:
+        now = time.monotonic()
+        if self.forbidden.get(user.id, 0) > now:
+            self.metrics["skipped_forbidden"] += 1
+            return False
+        dedupe_key = (user.id, guild_id, key or "")
+        if now - self.recent.get(dedupe_key, -self.dedupe_window) < self.dedupe_window:
+            self.metrics["skipped_duplicate"] += 1
+            return False
+        try:
+            self.queue.put_nowait((user, embed, dedupe_key))
+        except asyncio.QueueFull:
+            self.metrics["dropped"] += 1
+            logger.warning(f"DM queue full, dropping notification for {user}")
+            return False
+        self.recent[dedupe_key] = now
+        self.metrics["queued"] += 1
+        return True
+
+    def is_forbidden(self, user_id: int) -> bool:
+        return self.forbidden.get(user_id, 0) > time.monotonic()
+
+    def prune(self):
+        now = time.monotonic()
+        self.forbidden = {user_id: until for user_id, until in self.forbidden.items() if until > now}
+        self.recent = {key: at for key, at in self.recent.items() if now - at < self.dedupe_window}
+
+    def stats(self) -> dict:
+        return {**self.metrics, "depth": self.queue.qsize(), "forbidden_cached": len(self.forbidden)}
+
+    def _mark_forbidden(self, user_id: int):
+        if len(self.forbidden) >= self.forbidden_cache_size:
+            self.prune()
+            while len(self.forbidden) >= self.forbidden_cache_size:
+                del self.forbidden[next(iter(self.forbidden))]
+        self.forbidden[user_id] = time.monotonic() + self.forbidden_ttl
+
+    async def _worker(self):
+        while True:
+            user, embed, dedupe_key = await self.queue.get()
+            try:
+                await self._deliver(user, embed)
+            except Exception as e:
+                self.metrics["failed"] += 1
+                self.recent.pop(dedupe_key, None)
+                logger.error(f"Could not send DM to {user}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, user, embed: discord.Embed):
+        attempt = 0
+        while True:
+            if self.is_forbidden(user.id):
+                self.metrics["skipped_forbidden"] += 1
+                return
+            await self.limiter.acquire(DM_ROUTE)
+            try:
+                await user.send(embed=embed)
+                self.metrics["sent"] += 1
+                return
+            except discord.Forbidden:
+                self.metrics["forbidden"] += 1
+                self._mark_forbidden(user.id)
+                logger.warning(f"Could not send DM to {user}")
+                return
+            except discord.HTTPException as e:
+                if attempt >= self.max_retries or (e.status != 429 and e.status < 500):
+                    raise
+                attempt += 1
+                self.metrics["retries"] += 1
+                if e.status == 429:
+                    retry_after = float(e.response.headers.get("Retry-After", 1))
+                    self.limiter.penalize(DM_ROUTE, retry_after)
+                else:
+                    await asyncio.sleep(min(self.retry_max, self.retry_base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0))
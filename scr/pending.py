@@ -0,0 +1,337 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+import discord
+from storage import atomic_write_json
+from pipeline import RouteRateLimiter
+
+logger = logging.getLogger(__name__)
+
+REMIND = 1
+KICK = 2
+
+def next_step(settings: dict, joined_at: float, done: int = 0):
+    reminder_after = settings.get("unverified_reminder_after", 0)
+    kick_after = settings.get("unverified_kick_after", 0)
+    if done < REMIND and reminder_after and (not kick_after or reminder_after < kick_after):
+        return joined_at + reminder_after, REMIND
+    if done < KICK and kick_after:
+        return joined_at + kick_after, KICK
+    return None
+
+class PendingMembers:
+    def __init__(self, snapshot_path: str):
+        self.snapshot_path = snapshot_path
+        self.journal_path = f"{snapshot_path}.journal"
+        self.rotated_journal_path = f"{self.journal_path}.1"
+        # (guild_id, user_id) -> (due, stage, joined_at); the heap may hold stale deadlines, skipped when popped.
+        self.entries = {}
+        self.heap = []
+        self.pending_entries = 0
+        self.loaded = False
+        self.resolved = set()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self.entries
+
+    def read(self) -> tuple:
+        entries = {}
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    for guild_id, user_id, due, stage, joined_at in json.load(f):
+                        entries[(guild_id, user_id)] = (due, stage, joined_at)
+            except (json.JSONDecodeError, TypeError, ValueError) as e:
+                logger.error(f"Could not parse {self.snapshot_path}: {e}")
+        replayed = 0
+        for path in (self.rotated_journal_path, self.journal_path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line_no, line in enumerate(f, 1):
+                    try:
+                        op, guild_id, user_id, *entry = json.loads(line)
+                    except (json.JSONDecodeError, ValueError):
+                        logger.warning(f"Skipping corrupt pending entry at {path}:{line_no}")
+                        continue
+                    if op == "set":
+                        entries[(guild_id, user_id)] = tuple(entry)
+                    else:
+                        entries.pop((guild_id, user_id), None)
+                    replayed += 1
+        return entries, replayed
+
+    def merge(self, entries: dict, replayed: int):
+        # Members tracked or resolved while the file was loading are newer than what it holds.
+        for key, entry in entries.items():
+            if key not in self.resolved:
+                self.entries.setdefault(key, entry)
+        self.resolved = set()
+        self.pending_entries += replayed
+        self.heap = [(due, guild_id, user_id) for (guild_id, user_id), (due, _, _) in self.entries.items()]
+        heapq.heapify(self.heap)
+        self.loaded = True
+
+    def set(self, guild_id: int, user_id: int, due: float, stage: int, joined_at: float) -> str:
+        self.entries[(guild_id, user_id)] = (due, stage, joined_at)
+        heapq.heappush(self.heap, (due, guild_id, user_id))
+        self.pending_entries += 1
+        return json.dumps(["set", guild_id, user_id, due, stage, joined_at]) + "\n"
+
+    def discard(self, guild_id: int, user_id: int):
+        if self.entries.pop((guild_id, user_id), None) is None:
+            if self.loaded:
+                return None
+            self.resolved.add((guild_id, user_id))
+        self.pending_entries += 1
+        return json.dumps(["del", guild_id, user_id]) + "\n"
+
+    def next_due(self):
+        while self.heap:
+            due, guild_id, user_id = self.heap[0]
+            entry = self.entries.get((guild_id, user_id))
+            if entry is not None and entry[0] == due:
+                return due
+            heapq.heappop(self.heap)
+        return None
+
+    def pop_due(self, now: float, limit: int) -> list:
+        batch = []
+        while len(batch) < limit:
+            due = self.next_due()
+            if due is None or due > now:
+                break
+            _, guild_id, user_id = heapq.heappop(self.heap)
+            batch.append(((guild_id, user_id), self.entries[(guild_id, user_id)]))
+        return batch
+
+    def snapshot(self) -> list:
+        if len(self.heap) > 2 * len(self.entries) + 1000:
+            self.heap = [(due, guild_id, user_id) for (guild_id, user_id), (due, _, _) in self.entries.items()]
+            heapq.heapify(self.heap)
+        return [[guild_id, user_id, *entry] for (guild_id, user_id), entry in self.entries.items()]
+
+    def compact(self, records: list):
+        if os.path.exists(self.journal_path):
+            if os.path.exists(self.rotated_journal_path):
+                with open(self.journal_path, "r", encoding="utf-8") as src, \
+                        open(self.rotated_journal_path, "a", encoding="utf-8") as dst:
+                    dst.write(src.read())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.rotated_journal_path)
+        atomic_write_json(self.snapshot_path, records, separators=(",", ":"))
+        if os.path.exists(self.rotated_journal_path):
+            os.remove(self.rotated_journal_path)
+
+class PendingScheduler:
+    def __init__(self, bot, path: str, settings: dict = None):
+        settings = settings or {}
+        self.bot = bot
+        self.queue = PendingMembers(path)
+        self.batch_size = settings.get("batch_size", 50)
+        self.retry_delay = settings.get("retry_delay", 300)
+        self.compact_after = settings.get("compact_after", 10000)
+        self.limiter = RouteRateLimiter(settings.get("action_rate", 5), settings.get("action_per", 5))
+        self.wakeup = asyncio.Event()
+        self.sleeping_until = None
+        self.compact_lock = asyncio.Lock()
+        self.task = None
+        self.metrics = {"tracked": 0, "resolved": 0, "reminded": 0, "kicked": 0, "failed": 0}
+
+    @property
+    def writer(self):
+        return self.bot.data_manager.writer
+
+    async def start(self):
+        entries, replayed = await self.writer.run(self.queue.read)
+        self.queue.merge(entries, replayed)
+        logger.info(f"Loaded {len(self.queue)} pending members ({replayed} from journal)")
+        await self.reschedule()
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        if self.queue.loaded and self.queue.pending_entries:
+            await self.compact()
+
+    async def _append(self, line: str):
+        try:
+            await self.writer.append_lines(self.queue.journal_path, [line])
+        except Exception as e:
+            logger.error(f"Error appending to {self.queue.journal_path}: {e}")
+
+    async def track(self, guild_id: int, user_id: int, settings: dict, joined_at: float = None):
+        joined_at = time.time() if joined_at is None else joined_at
+        step = next_step(settings, joined_at)
+        if step is None:
+            return
+        await self._schedule(guild_id, user_id, step, joined_at)
+        self.metrics["tracked"] += 1
+
+    async def resolve(self, guild_id: int, user_id: int):
+        if await self._drop(guild_id, user_id):
+            self.metrics["resolved"] += 1
+
+    async def _drop(self, guild_id: int, user_id: int) -> bool:
+        line = self.queue.discard(guild_id, user_id)
+        if line is None:
+            return False
+        await self._append(line)
+        return True
+
+    async def _schedule(self, guild_id: int, user_id: int, step: tuple, joined_at: float):
+        due, stage = step
+        line = self.queue.set(guild_id, user_id, due, stage, joined_at)
+        # Only an earlier deadline than the one being slept on needs to wake the scheduler.
+        if self.sleeping_until is not None and due < self.sleeping_until:
+            self.wakeup.set()
+        await self._append(line)
+
+    async def reschedule(self):
+        # Deadlines follow the current settings, so a changed timeout also applies to members already waiting.
+        lines = []
+        for (guild_id, user_id), (due, stage, joined_at) in list(self.queue.entries.items()):
+            guild_config = self.bot.guild_registry.guild_configs.get(guild_id)
+            if guild_config is None:
+                continue
+            step = next_step(guild_config["SETTINGS"], joined_at, stage - 1)
+            if step is None:
+                lines.append(self.queue.discard(guild_id, user_id))
+            elif step != (due, stage):
+                lines.append(self.queue.set(guild_id, user_id, *step, joined_at))
+        if not lines:
+            return
+        logger.info(f"Rescheduled {len(lines)} pending members for the current timeouts")
+        self.wakeup.set()
+        try:
+            await self.writer.append_lines(self.queue.journal_path, lines)
+        except Exception as e:
+            logger.error(f"Error appending to {self.queue.journal_path}: {e}")
+
+    async def _run(self):
+        # Guilds are only cached once the gateway is ready; before that every member would look like they left.
+        await self.bot.wait_until_ready()
+        while True:
+            self.wakeup.clear()
+            due = self.queue.next_due()
+            now = time.time()
+            if due is None or due > now:
+                self.sleeping_until = float("inf") if due is None else due
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), None if due is None else due - now)
+                except asyncio.TimeoutError:
+                    pass
+                self.sleeping_until = None
+                continue
+            batch = self.queue.pop_due(now, self.batch_size)
+            results = await asyncio.gather(*(self._process(key, entry) for key, entry in batch), return_exceptions=True)
+            for (key, entry), result in zip(batch, results):
+                if isinstance(result, Exception) and key in self.queue:
+                    self.metrics["failed"] += 1
+                    logger.error(f"Pending action for member {key[1]} in guild {key[0]} failed: {result}")
+                    await self._schedule(*key, (time.time() + self.retry_delay, entry[1]), entry[2])
+            await self.maybe_compact()
+
+    async def _process(self, key: tuple, entry: tuple):
+        guild_id, user_id = key
+        _, stage, joined_at = entry
+        guild = self.bot.get_guild(guild_id)
+        context = await self.bot.guild_registry.get(guild_id) if guild and self.bot.owns_guild(guild_id) else None
+        # Settings may have been reloaded since the deadline was set, so the step is worked out again.
+        step = next_step(context.settings, joined_at, stage - 1) if context else None
+        if step is None:
+            await self.resolve(guild_id, user_id)
+            return
+        if step[0] > time.time():
+            await self._schedule(guild_id, user_id, step, joined_at)
+            return
+
+        member = await self.fetch_member(guild, user_id)
+        if key not in self.queue:
+            return
+        verify_role = context.role(guild, "verify")
+        if member is None or (verify_role and verify_role in member.roles) or await context.data_manager.get_verified_user(user_id):
+            await self.resolve(guild_id, user_id)
+            return
+
+        if step[1] == REMIND:
+            if context.settings.get("enable_dm_notifications", True):
+                kick_at = next_step(context.settings, joined_at, REMIND)
+                self.bot.dm_dispatcher.push(
+                    member, context.embeds.verify_reminder_dm(context.channel_ids.get("verify"), int(kick_at[0]) if kick_at else None),
+                    "verify_reminder", context.guild_id
+                )
+            self.metrics["reminded"] += 1
+        elif not await self.kick(context, guild, member, joined_at):
+            return
+
+        if key not in self.queue:
+            return
+        following = next_step(context.settings, joined_at, step[1])
+        if following is None:
+            await self._drop(guild_id, user_id)
+        else:
+            await self._schedule(guild_id, user_id, following, joined_at)
+
+    async def fetch_member(self, guild, user_id: int):
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+        route = f"members:{guild.id}"
+        await self.limiter.acquire(route)
+        try:
+            return await guild.fetch_member(user_id)
+        except discord.NotFound:
+            return None
+        except discord.HTTPException as e:
+            if e.status == 429:
+                self.limiter.penalize(route, float(e.response.headers.get("Retry-After", 1)))
+            raise
+
+    async def kick(self, context, guild, member, joined_at: float) -> bool:
+        route = f"kick:{guild.id}"
+        await self.limiter.acquire(route)
+        # The member may have verified while this kick waited for its turn.
+        if (guild.id, member.id) not in self.queue:
+            return False
+        kick_after = context.settings.get("unverified_kick_after", 0)
+        try:
+            await guild.kick(member, reason=f"Not verified within {kick_after}s of joining")
+        except discord.HTTPException as e:
+            if e.status == 429:
+                self.limiter.penalize(route, float(e.response.headers.get("Retry-After", 1)))
+            raise
+        self.metrics["kicked"] += 1
+        logger.info(f"Kicked unverified member {member} from guild {guild.id}")
+        if context.channel_ids.get("log") and context.log_sink:
+            context.log_sink.push(context.embeds.unverified_kick_log(member, int(joined_at)))
+        return True
+
+    async def maybe_compact(self):
+        if self.queue.loaded and self.queue.pending_entries >= self.compact_after:
+            await self.compact()
+
+    async def compact(self):
+        async with self.compact_lock:
+            await self._compact()
+
+    async def _compact(self):
+        await self.writer.drain()
+        records = self.queue.snapshot()
+        pending, self.queue.pending_entries = self.queue.pending_entries, 0
+        try:
+            await self.writer.run(self.queue.compact, records)
+            logger.info(f"Compacted {len(records)} pending members into {self.queue.snapshot_path}")
+        except Exception as e:
+            self.queue.pending_entries += pending
+            logger.error(f"Error compacting {self.queue.snapshot_path}: {e}")
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+class RouteRateLimiter:
+    def __init__(self, rate: int = 10, per: float = 10.0):
+        self.rate = rate
+        self.per = per
+        self.buckets = {}
+        self.locks = {}
+        self.blocked_until = {}
+        self.waits = 0
+        self.penalties = 0
+
+    async def acquire(self, route: str):
+        lock = self.locks.setdefault(route, asyncio.Lock())
+        async with lock:
+            while True:
+                now = time.monotonic()
+                tokens, last = self.buckets.get(route, (self.rate, now))
+                tokens = min(self.rate, tokens + (now - last) * self.rate / self.per)
+                blocked = self.blocked_until.get(route, 0) - now
+                if blocked <= 0 and tokens >= 1:
+                    self.buckets[route] = (tokens - 1, now)
+                    return
+                self.buckets[route] = (tokens, now)
+                self.waits += 1
+                await asyncio.sleep(max(blocked, (1 - tokens) * self.per / self.rate))
+
+    def penalize(self, route: str, retry_after: float):
+        self.penalties += 1
+        self.blocked_until[route] = max(self.blocked_until.get(route, 0), time.monotonic() + retry_after)
+
+class JoinPipeline:
+    def __init__(self, handler, settings: dict = None):
+        settings = settings or {}
+        self.handler = handler
+        self.queue = asyncio.Queue(maxsize=settings.get("queue_size", 10000))
+        self.worker_count = settings.get("workers", 4)
+        self.batch_size = settings.get("batch_size", 10)
+        self.raid_join_threshold = settings.get("raid_join_threshold", 30)
+        self.raid_window = settings.get("raid_window", 10)
+        self.raid_cooldown = settings.get("raid_cooldown", 120)
+        self.limiter = RouteRateLimiter(settings.get("role_rate", 10), settings.get("role_per", 10))
+        self.deferred = deque(maxlen=settings.get("deferred_limit", 5000))
+        self.join_times = deque()
+        self.raid_mode = False
+        self.raid_until = 0.0
+        self.tasks = []
+        self.idle = asyncio.Event()
+        self.metrics = {
+            "enqueued": 0,
+            "processed": 0,
+            "failed": 0,
+            "backpressure_waits": 0,
+            "max_depth": 0,
+            "deferred": 0,
+            "deferred_dropped": 0,
+            "raid_activations": 0,
+            "total_wait": 0.0,
+        }
+
+    def start(self):
+        if self.tasks:
+            return
+        self.tasks = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        self.tasks.append(asyncio.create_task(self._deferred_runner()))
+        logger.info(f"Join pipeline started with {self.worker_count} workers")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "depth": self.queue.qsize(),
+            "deferred_depth": len(self.deferred),
+            "raid_mode": self.raid_mode,
+            "rate_limit_waits": self.limiter.waits,
+            "rate_limit_penalties": self.limiter.penalties,
+        }
+
+    def _record_join(self):
+        now = time.monotonic()
+        self.join_times.append(now)
+        self._update_raid_mode(now)
+
+    def _update_raid_mode(self, now: float):
+        while self.join_times and now - self.join_times[0] > self.raid_window:
+            self.join_times.popleft()
+
+        if len(self.join_times) >= self.raid_join_threshold:
+            if not self.raid_mode:
+                self.raid_mode = True
+                self.metrics["raid_activations"] += 1
+                logger.warning(f"Raid mode enabled: {len(self.join_times)} joins in the last {self.raid_window}s")
+            self.raid_until = now + self.raid_cooldown
+        elif self.raid_mode and now >= self.raid_until:
+            self.raid_mode = False
+            logger.info("Raid mode disabled, join rate back to normal")
+            self.idle.set()
+
+    async def submit(self, member):
+        self._record_join()
+        item = (member, time.monotonic())
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.metrics["backpressure_waits"] += 1
+            await self.queue.put(item)
+        self.metrics["enqueued"] += 1
+        self.metrics["max_depth"] = max(self.metrics["max_depth"], self.queue.qsize())
+
+    async def _worker(self, worker_id: int):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            now = time.monotonic()
+            for _, enqueued_at in batch:
+                self.metrics["total_wait"] += now - enqueued_at
+
+            results = await asyncio.gather(*(self.handler(member) for member, _ in batch), return_exceptions=True)
+            for (member, _), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    self.metrics["failed"] += 1
+                    logger.error(f"Join worker {worker_id} failed to process {member}: {result}")
+                else:
+                    self.metrics["processed"] += 1
+                self.queue.task_done()
+
+            if self.queue.empty():
+                self.idle.set()
+
+    async def dispatch(self, factory):
+        if self.raid_mode:
+            self._update_raid_mode(time.monotonic())
+        if not self.raid_mode:
+            await factory()
+            return
+        if len(self.deferred) == self.deferred.maxlen:
+            self.metrics["deferred_dropped"] += 1
+        self.deferred.append(factory)
+        self.metrics["deferred"] += 1
+
+    async def _deferred_runner(self):
+        while True:
+            await self.idle.wait()
+            self.idle.clear()
+            while self.deferred and self.queue.empty():
+                factory = self.deferred.popleft()
+                try:
+                    await factory()
+                except Exception as e:
+                    logger.error(f"Deferred join task failed: {e}")
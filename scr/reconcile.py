@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+import discord
+
+logger = logging.getLogger(__name__)
+
+STAT_KEYS = ("scanned", "verify_added", "unverified_added", "unverified_removed", "store_added", "failed")
+
+class Reconciler:
+    def __init__(self, context, guild, limiter, settings: dict = None, dry_run: bool = False, progress=None):
+        settings = settings or {}
+        self.context = context
+        self.guild = guild
+        self.limiter = limiter
+        self.route = f"member_roles:{guild.id}"
+        self.worker_count = settings.get("workers", 4)
+        self.page_size = min(settings.get("page_size", 1000), 1000)
+        self.progress_interval = settings.get("progress_interval", 5)
+        self.dry_run = dry_run
+        self.progress = progress
+        self.queue = asyncio.Queue(maxsize=self.worker_count * 2)
+        self.stats = dict.fromkeys(STAT_KEYS, 0)
+        self.after = None
+        self.started = time.monotonic()
+        self.last_progress = 0.0
+
+    def load_checkpoint(self):
+        checkpoint = self.context.data_manager.state.get("reconcile_checkpoint")
+        if checkpoint and checkpoint.get("dry_run", False) == self.dry_run:
+            self.after = checkpoint["after"]
+            self.stats.update(checkpoint.get("stats", {}))
+            logger.info(f"Resuming reconciliation of guild {self.guild.id} after member {self.after}")
+
+    async def save_checkpoint(self):
+        await self.context.data_manager.update_state(
+            reconcile_checkpoint={"after": self.after, "dry_run": self.dry_run, "stats": self.stats}
+        )
+
+    async def run(self) -> dict:
+        verify_role = self.context.role(self.guild, "verify")
+        if not verify_role:
+            raise ValueError("verify role not configured")
+        unverified_role = self.context.role(self.guild, "unverified")
+
+        workers = [asyncio.create_task(self._worker(verify_role, unverified_role)) for _ in range(self.worker_count)]
+        try:
+            while True:
+                after = discord.Object(id=self.after) if self.after else None
+                page = [member async for member in self.guild.fetch_members(limit=self.page_size, after=after)]
+                if not page:
+                    break
+                await self._process_page(page)
+                if len(page) < self.page_size:
+                    break
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        await self.context.data_manager.update_state(reconcile_checkpoint=None)
+        await self._report(final=True)
+        return self.stats
+
+    async def _process_page(self, page: list):
+        for member in page:
+            await self.queue.put(member)
+        await self.queue.join()
+        # Each page is one request for the members after self.after, so its highest id is a safe resume point once drained.
+        self.after = max(member.id for member in page)
+        await self.save_checkpoint()
+        if time.monotonic() - self.last_progress >= self.progress_interval:
+            await self._report()
+
+    async def _report(self, final: bool = False):
+        self.last_progress = time.monotonic()
+        logger.info(f"Reconciliation of guild {self.guild.id}: {self.stats['scanned']} scanned, {self.changes()} changes, {self.stats['failed']} failed")
+        if self.progress:
+            try:
+                await self.progress(self, final)
+            except Exception as e:
+                logger.warning(f"Could not report reconciliation progress: {e}")
+
+    def changes(self) -> int:
+        return sum(self.stats[key] for key in ("verify_added", "unverified_added", "unverified_removed", "store_added"))
+
+    def elapsed(self) -> int:
+        return int(time.monotonic() - self.started)
+
+    async def _worker(self, verify_role, unverified_role):
+        while True:
+            member = await self.queue.get()
+            try:
+                await self.reconcile_member(member, verify_role, unverified_role)
+            except discord.Forbidden:
+                self.stats["failed"] += 1
+                logger.error(f"Missing permissions to reconcile roles for {member}")
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"Error reconciling {member}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def reconcile_member(self, member, verify_role, unverified_role):
+        self.stats["scanned"] += 1
+        self.context.touch()
+        if member.bot:
+            return
+        data_manager = self.context.data_manager
+        verified = await data_manager.is_verified(member.id)
+        has_verify = member.get_role(verify_role.id) is not None
+        has_unverified = unverified_role is not None and member.get_role(unverified_role.id) is not None
+
+        if has_verify and not verified:
+            self.stats["store_added"] += 1
+            if not self.dry_run:
+                await data_manager.add_verified_user(member, "reconcile")
+            verified = True
+
+        if verified:
+            if not has_verify:
+                await self._paced(member.add_roles, verify_role, reason="Reconciliation - verified user missing role")
+                self.stats["verify_added"] += 1
+            if has_unverified:
+                await self._paced(member.remove_roles, unverified_role, reason="Reconciliation - user is verified")
+                self.stats["unverified_removed"] += 1
+        elif unverified_role and not has_unverified:
+            await self._paced(member.add_roles, unverified_role, reason="Reconciliation - unverified member")
+            self.stats["unverified_added"] += 1
+
+    async def _paced(self, method, *roles, reason: str = None):
+        if self.dry_run:
+            return
+        await self.limiter.acquire(self.route)
+        try:
+            await method(*roles, reason=reason)
+        except discord.HTTPException as e:
+            if e.status == 429:
+                self.limiter.penalize(self.route, float(e.response.headers.get("Retry-After", 1)))
+            raise
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+from utils import Config, LanguageManager
+
+logger = logging.getLogger(__name__)
+
+# Sections read once at startup; changing them is reported but only applied on restart.
+RESTART_SECTIONS = (
+    "TOKEN", "GUILD_ID", "DATA", "GUILD_REGISTRY", "GATEWAY", "SHARDING", "JOIN_PIPELINE",
+    "LOG_SINK", "DM_NOTIFICATIONS", "PENDING_MEMBERS", "CAPTCHA", "METRICS", "RELOAD",
+)
+
+class ConfigReloader:
+    def __init__(self, bot, settings: dict = None):
+        settings = settings or {}
+        self.bot = bot
+        self.interval = settings.get("interval", 5)
+        self.signatures = self.scan()
+        self.task = None
+        self.metrics = {"reloads": 0, "rejected": 0}
+
+    def scan(self) -> dict:
+        paths = [self.bot.config.config_path, *LanguageManager.language_files(self.bot.lang.base_dir).values()]
+        signatures = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signatures[path] = (stat.st_mtime_ns, stat.st_size)
+        return signatures
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Error checking config files for changes: {e}")
+
+    async def check(self) -> bool:
+        signatures = self.scan()
+        if signatures == self.signatures:
+            return False
+        changed = {path for path in signatures.keys() | self.signatures.keys() if signatures.get(path) != self.signatures.get(path)}
+        self.signatures = signatures
+        config_changed = self.bot.config.config_path in changed
+        return await self.reload(config=config_changed, languages=bool(changed - {self.bot.config.config_path}))
+
+    async def reload(self, config: bool = True, languages: bool = True) -> bool:
+        try:
+            data = Config.validate(await asyncio.to_thread(self.bot.config.load_config)) if config else self.bot.config.data
+            if languages:
+                tables = await asyncio.to_thread(LanguageManager.read_languages, self.bot.lang.base_dir)
+                tables = self.validate_languages(data, *tables)
+        except (OSError, ValueError) as e:
+            self.metrics["rejected"] += 1
+            logger.error(f"Reload rejected, keeping the current configuration: {e}")
+            return False
+
+        previous_tables = self.bot.lang.languages, self.bot.lang.tables
+        if languages:
+            self.bot.lang.swap(*tables)
+        if config:
+            current = self.bot.config.data
+            for section in RESTART_SECTIONS:
+                if data.get(section) != current.get(section):
+                    logger.warning(f"{section} changed; restart the bot to apply it")
+            data = {key: value for key, value in data.items() if key not in RESTART_SECTIONS}
+            data.update((section, current[section]) for section in RESTART_SECTIONS if section in current)
+        try:
+            await self.bot.apply_config(data)
+        except Exception as e:
+            if languages:
+                self.bot.lang.swap(*previous_tables)
+            self.metrics["rejected"] += 1
+            logger.error(f"Reload failed, keeping the current configuration: {e}")
+            return False
+        self.metrics["reloads"] += 1
+        logger.info(f"Reloaded {' and '.join(name for name, done in (('config', config), ('language files', languages)) if done)}")
+        return True
+
+    def validate_languages(self, data: dict, languages: dict, tables: dict, failed: list) -> tuple:
+        for code in failed:
+            # Keep the previous version of a file that no longer parses instead of dropping the language.
+            if code in self.bot.lang.languages:
+                languages[code] = self.bot.lang.languages[code]
+                tables[code] = self.bot.lang.tables[code]
+        default_lang = data.get("SETTINGS", {}).get("default_language", "en")
+        for code in {default_lang, "en"} & set(self.bot.lang.languages):
+            missing = [section for section in LanguageManager.REQUIRED_SECTIONS if section not in languages.get(code, {})]
+            if missing:
+                raise ValueError(f"language '{code}' is missing {', '.join(missing)}")
+        return languages, tables
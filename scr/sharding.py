@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+import discord
+from shared_store import SharedStore
+
+logger = logging.getLogger(__name__)
+
+HEALTHY_STATUSES = ("ready", "resumed")
+
+def shard_for_guild(guild_id: int, shard_count: int) -> int:
+    return (guild_id >> 22) % shard_count
+
+def shard_ranges(shard_count: int, processes: int) -> list:
+    processes = max(1, min(processes, shard_count))
+    return [list(range(i * shard_count // processes, (i + 1) * shard_count // processes)) for i in range(processes)]
+
+async def recommended_shard_count(token: str) -> int:
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        return (await http.get_bot_gateway())[0]
+    finally:
+        await http.close()
+
+class ShardHealth:
+    def __init__(self):
+        self.shards = {}
+
+    def mark(self, shard_id: int, status: str):
+        entry = self.shards.setdefault(shard_id, {"status": status, "since": time.time(), "reconnects": 0})
+        if status == "resumed" or (status == "connected" and entry["status"] == "disconnected"):
+            entry["reconnects"] += 1
+        entry["status"] = status
+        entry["since"] = time.time()
+
+    def snapshot(self, client) -> list:
+        rows = []
+        for shard_id, latency in client.latencies:
+            entry = self.shards.get(shard_id, {"status": "starting", "reconnects": 0})
+            rows.append({
+                "shard_id": shard_id,
+                "status": entry["status"],
+                "latency": latency if latency == latency and latency != float("inf") else None,
+                "reconnects": entry["reconnects"],
+            })
+        return rows
+
+class ShardCluster:
+    def __init__(self, target, config, token: str):
+        sharding_config = config.get("SHARDING", {})
+        self.target = target
+        self.token = token
+        self.processes = sharding_config.get("processes", 1)
+        self.shard_count = sharding_config.get("shard_count")
+        self.health_interval = sharding_config.get("health_interval", 30)
+        self.restart_delay = sharding_config.get("restart_delay", 5)
+        self.shared_store_path = sharding_config.get("shared_store", "data/shared.db")
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = {}
+
+    def start_worker(self, index: int, shard_ids: list):
+        process = self.context.Process(
+            target=self.target, args=(index, shard_ids, self.shard_count), name=f"shard-worker-{index}"
+        )
+        process.start()
+        self.workers[index] = (process, shard_ids)
+        logger.info(f"Started worker {index} (pid {process.pid}) for shards {shard_ids[0]}-{shard_ids[-1]} of {self.shard_count}")
+
+    def run(self):
+        if not self.shard_count:
+            self.shard_count = asyncio.run(recommended_shard_count(self.token))
+            logger.info(f"Using recommended shard count {self.shard_count}")
+
+        shared = SharedStore(self.shared_store_path)
+        shared.execute("DELETE FROM shard_health")
+        for index, shard_ids in enumerate(shard_ranges(self.shard_count, self.processes)):
+            self.start_worker(index, shard_ids)
+
+        try:
+            while True:
+                time.sleep(self.health_interval)
+                for index, (process, shard_ids) in list(self.workers.items()):
+                    if not process.is_alive():
+                        logger.error(f"Worker {index} exited with code {process.exitcode}, restarting in {self.restart_delay}s")
+                        time.sleep(self.restart_delay)
+                        self.start_worker(index, shard_ids)
+                self.report(shared)
+        except KeyboardInterrupt:
+            logger.info("Stopping shard workers")
+        finally:
+            self.stop()
+            shared.close()
+
+    def report(self, shared: SharedStore):
+        now = time.time()
+        rows = shared.shard_health()
+        healthy = 0
+        for row in rows:
+            if now - row["updated_at"] > self.health_interval * 3:
+                logger.warning(f"Shard {row['shard_id']} (worker {row['process_index']}) has not reported for {int(now - row['updated_at'])}s")
+            elif row["status"] not in HEALTHY_STATUSES:
+                logger.warning(f"Shard {row['shard_id']} (worker {row['process_index']}) is {row['status']}")
+            else:
+                healthy += 1
+        latencies = [row["latency"] for row in rows if row["latency"] is not None]
+        average = f"{sum(latencies) / len(latencies) * 1000:.0f}ms" if latencies else "n/a"
+        logger.info(f"Shard health: {healthy}/{self.shard_count} healthy, average latency {average}")
+
+    def stop(self):
+        # Ctrl+C reaches the whole process group, so give workers a moment to shut down on their own first.
+        for process, _ in self.workers.values():
+            process.join(timeout=10)
+        for process, _ in self.workers.values():
+            if process.is_alive():
+                try:
+                    os.kill(process.pid, signal.SIGINT)
+                except OSError:
+                    process.terminate()
+        for process, _ in self.workers.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+                process.join()
@@ -0,0 +1,233 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from storage import VerifiedUserStore
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verified_users (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cooldowns (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    cooldown_until REAL NOT NULL DEFAULT 0,
+    window_until REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS shard_health (
+    shard_id INTEGER PRIMARY KEY,
+    process_index INTEGER NOT NULL,
+    pid INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    latency REAL,
+    reconnects INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+"""
+
+class SharedStore:
+    def __init__(self, path: str = "data/shared.db", busy_timeout: float = 5.0):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        logger.info(f"Opened shared store {path}")
+
+    def execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self.lock:
+            return self.conn.execute(sql, params)
+
+    def fetchone(self, sql: str, params: tuple = ()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql: str, params: tuple = ()) -> list:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def transaction(self, statements: list):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    if isinstance(params, list):
+                        self.conn.executemany(sql, params)
+                    else:
+                        self.conn.execute(sql, params)
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def record_shard_health(self, process_index: int, rows: list):
+        now = time.time()
+        self.transaction([(
+            "INSERT OR REPLACE INTO shard_health (shard_id, process_index, pid, status, latency, reconnects, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(r["shard_id"], process_index, os.getpid(), r["status"], r["latency"], r["reconnects"], now) for r in rows]
+        )])
+
+    def shard_health(self) -> list:
+        rows = self.fetchall(
+            "SELECT shard_id, process_index, pid, status, latency, reconnects, updated_at FROM shard_health ORDER BY shard_id"
+        )
+        keys = ("shard_id", "process_index", "pid", "status", "latency", "reconnects", "updated_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class SharedVerifiedUserStore:
+    # Queries may wait on another process's write lock, so DataManager runs them on the writer thread.
+    blocking = True
+    pending_entries = 0
+
+    def __init__(self, shared: SharedStore, guild_id: int, legacy_snapshot_path: str = None):
+        self.shared = shared
+        self.guild_id = guild_id
+        self.legacy_snapshot_path = legacy_snapshot_path
+
+    def load(self):
+        count = len(self)
+        if count == 0 and self.legacy_snapshot_path and os.path.exists(self.legacy_snapshot_path):
+            legacy = VerifiedUserStore(self.legacy_snapshot_path)
+            legacy.load()
+            if len(legacy):
+                self.replace_all(legacy.all())
+                count = len(legacy)
+                logger.info(f"Imported {count} verified users for guild {self.guild_id} from {self.legacy_snapshot_path}")
+        logger.info(f"Shared store has {count} verified users for guild {self.guild_id}")
+
+    def unload(self):
+        pass
+
+    def __len__(self) -> int:
+        return self.shared.fetchone("SELECT COUNT(*) FROM verified_users WHERE guild_id = ?", (self.guild_id,))[0]
+
+    def __contains__(self, user_id: int) -> bool:
+        return self.shared.fetchone(
+            "SELECT 1 FROM verified_users WHERE guild_id = ? AND user_id = ?", (self.guild_id, user_id)
+        ) is not None
+
+    def get(self, user_id: int):
+        row = self.shared.fetchone(
+            "SELECT record FROM verified_users WHERE guild_id = ? AND user_id = ?", (self.guild_id, user_id)
+        )
+        return json.loads(row[0]) if row else None
+
+    def all(self) -> list:
+        rows = self.shared.fetchall("SELECT record FROM verified_users WHERE guild_id = ?", (self.guild_id,))
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_all(self, batch_size: int = 1000):
+        last_id = 0
+        while True:
+            rows = self.shared.fetchall(
+                "SELECT user_id, record FROM verified_users WHERE guild_id = ? AND user_id > ? ORDER BY user_id LIMIT ?",
+                (self.guild_id, last_id, batch_size)
+            )
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            for row in rows:
+                yield json.loads(row[1])
+
+    def add(self, record: dict) -> bool:
+        cursor = self.shared.execute(
+            "INSERT OR IGNORE INTO verified_users (guild_id, user_id, record) VALUES (?, ?, ?)",
+            (self.guild_id, int(record["id"]), json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        )
+        return cursor.rowcount > 0
+
+    def replace_all(self, records: list):
+        self.shared.transaction([
+            ("DELETE FROM verified_users WHERE guild_id = ?", (self.guild_id,)),
+            ("INSERT OR REPLACE INTO verified_users (guild_id, user_id, record) VALUES (?, ?, ?)", [
+                (self.guild_id, int(r["id"]), json.dumps(r, ensure_ascii=False, separators=(",", ":"))) for r in records
+            ]),
+        ])
+
+    def compact(self, records: list):
+        pass
+
+class SharedVerificationLimiter:
+    def __init__(self, shared: SharedStore, guild_id: int, cooldown: float = 30, max_attempts: int = 3, attempt_window: float = 300):
+        self.shared = shared
+        self.guild_id = guild_id
+        self.cooldown = cooldown
+        self.max_attempts = max_attempts
+        self.attempt_window = attempt_window
+        self.evictions = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return self.shared.fetchone("SELECT COUNT(*) FROM cooldowns WHERE guild_id = ?", (self.guild_id,))[0]
+
+    def stats(self) -> dict:
+        return {"size": len(self), "evictions": self.evictions, "expired": self.expired}
+
+    def _entry(self, user_id: int):
+        return self.shared.fetchone(
+            "SELECT cooldown_until, window_until, attempts FROM cooldowns WHERE guild_id = ? AND user_id = ?",
+            (self.guild_id, user_id)
+        )
+
+    def prune(self, now: float = None):
+        now = time.time() if now is None else now
+        cursor = self.shared.execute(
+            "DELETE FROM cooldowns WHERE guild_id = ? AND cooldown_until <= ? AND window_until <= ?",
+            (self.guild_id, now, now)
+        )
+        self.expired += max(cursor.rowcount, 0)
+
+    def cooldown_remaining(self, user_id: int) -> int:
+        entry = self._entry(user_id)
+        if entry is None:
+            return 0
+        return max(0, int(entry[0] - time.time() + 0.999))
+
+    def locked_remaining(self, user_id: int) -> int:
+        entry = self._entry(user_id)
+        if entry is None or entry[2] < self.max_attempts:
+            return 0
+        return max(0, int(entry[1] - time.time() + 0.999))
+
+    def start_cooldown(self, user_id: int):
+        self.shared.execute(
+            "INSERT INTO cooldowns (guild_id, user_id, cooldown_until) VALUES (?, ?, ?) "
+            "ON CONFLICT (guild_id, user_id) DO UPDATE SET cooldown_until = excluded.cooldown_until",
+            (self.guild_id, user_id, time.time() + self.cooldown)
+        )
+
+    def record_failure(self, user_id: int) -> int:
+        now = time.time()
+        rows = self.shared.fetchall(
+            "INSERT INTO cooldowns (guild_id, user_id, window_until, attempts) VALUES (?, ?, ?, 1) "
+            "ON CONFLICT (guild_id, user_id) DO UPDATE SET "
+            "attempts = CASE WHEN window_until <= ? THEN 1 ELSE attempts + 1 END, "
+            "window_until = CASE WHEN window_until <= ? THEN excluded.window_until ELSE window_until END "
+            "RETURNING attempts",
+            (self.guild_id, user_id, now + self.attempt_window, now, now)
+        )
+        return max(0, self.max_attempts - rows[0][0])
+
+    def reset_attempts(self, user_id: int):
+        self.shared.execute(
+            "UPDATE cooldowns SET window_until = 0, attempts = 0 WHERE guild_id = ? AND user_id = ?",
+            (self.guild_id, user_id)
+        )
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+class BootTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.marks = {}
+        self.tasks = set()
+        self.done = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = time.perf_counter() - started
+            logger.info(f"Boot stage {name} took {self.stages[name] * 1000:.0f} ms")
+
+    def mark(self, name: str) -> bool:
+        if name in self.marks:
+            return False
+        self.marks[name] = self.elapsed()
+        logger.info(f"{name.replace('_', ' ').capitalize()} {self.marks[name]:.2f}s after start")
+        return True
+
+    def background(self, name: str, coro):
+        if self.done is None:
+            self.done = asyncio.Event()
+        task = asyncio.create_task(self._run(name, coro))
+        self.tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    async def _run(self, name: str, coro):
+        try:
+            with self.stage(name):
+                await coro
+        except Exception as e:
+            logger.error(f"Background boot stage {name} failed: {e}")
+
+    def _finished(self, task: asyncio.Task):
+        self.tasks.discard(task)
+        if self.tasks or task.cancelled():
+            return
+        self.mark("boot_complete")
+        stages = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.stages.items())
+        logger.info(f"Boot stages: {stages}")
+        self.done.set()
+
+    async def wait(self, timeout: float = None) -> bool:
+        if self.done is None:
+            return True
+        try:
+            await asyncio.wait_for(self.done.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stop(self):
+        for task in list(self.tasks):
+            task.cancel()
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+def atomic_write_json(file_path: str, data, **dump_kwargs):
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+def atomic_write_bytes(file_path: str, data: bytes):
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+def append_lines(file_path: str, lines: list):
+    with open(file_path, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+class AsyncWriter:
+    def __init__(self, flush_delay: float = 0.05):
+        self.flush_delay = flush_delay
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="data-writer")
+        self._pending_json = {}
+        self._pending_lines = {}
+        self._waiters = []
+        self._flush_handle = None
+        self._flush_tasks = set()
+        self.flushes = 0
+        self.coalesced_writes = 0
+
+    async def run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def save_json(self, file_path: str, data, **dump_kwargs) -> asyncio.Future:
+        # Serialized on the caller's thread, so the writer never iterates dicts the event loop may still be changing.
+        payload = json.dumps(data, **dump_kwargs).encode("utf-8")
+        if file_path in self._pending_json:
+            self.coalesced_writes += 1
+        self._pending_json[file_path] = payload
+        return self._schedule()
+
+    def append_lines(self, file_path: str, lines: list) -> asyncio.Future:
+        self._pending_lines.setdefault(file_path, []).extend(lines)
+        return self._schedule()
+
+    def _schedule(self) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.flush_delay, self._start_flush)
+        return waiter
+
+    def _start_flush(self):
+        self._flush_handle = None
+        json_items, self._pending_json = self._pending_json, {}
+        line_items, self._pending_lines = self._pending_lines, {}
+        waiters, self._waiters = self._waiters, []
+        if not waiters:
+            return
+        # Submit synchronously so the batch is queued on the writer thread in call order.
+        future = asyncio.get_running_loop().run_in_executor(self.executor, self._write_batch, json_items, line_items)
+        task = asyncio.ensure_future(self._finish_flush(future, waiters))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _finish_flush(self, future, waiters: list):
+        try:
+            await future
+            self.flushes += 1
+        except Exception as e:
+            logger.error(f"Error flushing pending writes: {e}")
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _write_batch(self, json_items: dict, line_items: dict):
+        for file_path, lines in line_items.items():
+            append_lines(file_path, lines)
+        for file_path, payload in json_items.items():
+            atomic_write_bytes(file_path, payload)
+
+    async def drain(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._start_flush()
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+class VerifiedUserStore:
+    blocking = False
+
+    def __init__(self, snapshot_path: str, journal_path: str = None):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or f"{snapshot_path}.journal"
+        self.rotated_journal_path = f"{self.journal_path}.1"
+        self.index = {}
+        self.pending_entries = 0
+
+    def load(self):
+        index = {}
+        snapshot = self._read_snapshot()
+        for record in snapshot:
+            if isinstance(record, dict) and "id" in record:
+                index[int(record["id"])] = record
+
+        replayed = 0
+        for path in (self.rotated_journal_path, self.journal_path):
+            replayed += self._replay_journal(path, index)
+
+        self.index = index
+        self.pending_entries = replayed
+        logger.info(f"Loaded {len(index)} verified users ({len(snapshot)} from snapshot, {replayed} from journal)")
+
+    def _read_snapshot(self) -> list:
+        if not os.path.exists(self.snapshot_path):
+            return []
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except json.JSONDecodeError as e:
+            logger.error(f"Could not parse snapshot {self.snapshot_path}: {e}")
+            return []
+        if not isinstance(data, list):
+            logger.error(f"Snapshot {self.snapshot_path} is not a list, ignoring it")
+            return []
+        return data
+
+    def _replay_journal(self, path: str, index: dict) -> int:
+        if not os.path.exists(path):
+            return 0
+        replayed = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping corrupt journal entry at {path}:{line_no}")
+                    continue
+                index[int(record["id"])] = record
+                replayed += 1
+        return replayed
+
+    def unload(self):
+        self.index = {}
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.index
+
+    def get(self, user_id: int):
+        return self.index.get(user_id)
+
+    def all(self) -> list:
+        return list(self.index.values())
+
+    def add(self, record: dict):
+        user_id = int(record["id"])
+        if user_id in self.index:
+            return None
+        self.index[user_id] = record
+        self.pending_entries += 1
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def replace_all(self, records: list):
+        self.index = {int(r["id"]): r for r in records}
+        self.pending_entries += 1
+
+    def rotate_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        if os.path.exists(self.rotated_journal_path):
+            # A previous compaction never finished; keep its entries until a snapshot lands.
+            with open(self.journal_path, "r", encoding="utf-8") as src, \
+                    open(self.rotated_journal_path, "a", encoding="utf-8") as dst:
+                dst.write(src.read())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self.rotated_journal_path)
+
+    def compact(self, records: list):
+        self.rotate_journal()
+        atomic_write_json(self.snapshot_path, records, ensure_ascii=False, separators=(",", ":"))
+        if os.path.exists(self.rotated_journal_path):
+            os.remove(self.rotated_journal_path)
@@ -0,0 +1,329 @@
+import argparse
+import json
+import logging
+import os
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, islice
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"VUSB"
+VERSION = 1
+FLAG_ZLIB = 1
+HEADER = struct.Struct("<4sBB")
+CHUNK_HEADER = struct.Struct("<II")
+NO_TIMESTAMP = -(2 ** 63)
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+FORMATS = ("json", "ndjson", "bin")
+
+def parse_timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def validate_record(record) -> dict:
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+    user_id = record.get("id")
+    if isinstance(user_id, str) and user_id.isdigit():
+        user_id = int(user_id)
+    if not isinstance(user_id, int) or isinstance(user_id, bool) or not 0 < user_id < 2 ** 64:
+        raise ValueError(f"invalid id {record.get('id')!r}")
+    verified_at = record.get("verified_at")
+    if not isinstance(verified_at, str):
+        raise ValueError(f"missing verified_at for {user_id}")
+    try:
+        parse_timestamp(verified_at)
+    except ValueError:
+        raise ValueError(f"invalid verified_at {verified_at!r} for {user_id}")
+    return {
+        "id": user_id,
+        "name": str(record.get("name", "")),
+        "verified_at": verified_at,
+        "method": str(record.get("method", "unknown")),
+    }
+
+def detect_format(path: str) -> str:
+    with open(path, "rb") as f:
+        head = f.read(4)
+    if head == MAGIC:
+        return "bin"
+    return "ndjson" if path.endswith((".ndjson", ".jsonl")) else "json"
+
+def chunked(records, size: int):
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def since_filter(records, since: datetime):
+    for record in records:
+        if parse_timestamp(record["verified_at"]) >= since:
+            yield record
+
+def read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        yield from json.load(f)
+
+def read_ndjson(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no}: {e}")
+
+def write_ndjson(f, records) -> int:
+    count = 0
+    for record in records:
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+        count += 1
+    return count
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def encode_chunk(records: list) -> bytes:
+    ids = array("Q")
+    timestamps = array("q")
+    method_idx = array("H")
+    name_lens = array("H")
+    methods = {}
+    names = []
+    for record in records:
+        ids.append(int(record["id"]))
+        try:
+            delta = parse_timestamp(record["verified_at"]) - EPOCH
+            timestamps.append((delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds)
+        except (KeyError, ValueError):
+            timestamps.append(NO_TIMESTAMP)
+        method_idx.append(methods.setdefault(record.get("method", "unknown"), len(methods)))
+        name = record.get("name", "").encode("utf-8")[:65535]
+        name_lens.append(len(name))
+        names.append(name)
+
+    method_table = b"".join(struct.pack("<H", len(m.encode("utf-8"))) + m.encode("utf-8") for m in methods)
+    return b"".join((
+        _little_endian(ids),
+        _little_endian(timestamps),
+        struct.pack("<H", len(methods)), method_table,
+        _little_endian(method_idx),
+        _little_endian(name_lens),
+        b"".join(names),
+    ))
+
+def format_timestamp(ts: int, day_cache: dict) -> str:
+    # Same text as str(datetime) for a UTC timestamp, with the date part cached per day.
+    seconds, micros = divmod(ts, 1000000)
+    day, seconds = divmod(seconds, 86400)
+    date = day_cache.get(day)
+    if date is None:
+        date = day_cache[day] = str((EPOCH + timedelta(days=day)).date())
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if micros:
+        return f"{date} {hours:02d}:{minutes:02d}:{seconds:02d}.{micros:06d}+00:00"
+    return f"{date} {hours:02d}:{minutes:02d}:{seconds:02d}+00:00"
+
+def decode_chunk(payload: bytes, count: int) -> list:
+    view = memoryview(payload)
+    offset = 0
+
+    def take(size: int) -> bytes:
+        nonlocal offset
+        if offset + size > len(view):
+            raise ValueError("truncated chunk")
+        data = view[offset:offset + size].tobytes()
+        offset += size
+        return data
+
+    ids = _from_little_endian("Q", take(8 * count))
+    timestamps = _from_little_endian("q", take(8 * count))
+    methods = []
+    for _ in range(struct.unpack("<H", take(2))[0]):
+        methods.append(take(struct.unpack("<H", take(2))[0]).decode("utf-8"))
+    method_idx = _from_little_endian("H", take(2 * count))
+    name_lens = _from_little_endian("H", take(2 * count))
+
+    names = take(sum(name_lens))
+    offsets = list(accumulate(name_lens, initial=0))
+    day_cache = {}
+    return [{
+        "id": ids[i],
+        "name": names[offsets[i]:offsets[i + 1]].decode("utf-8"),
+        "verified_at": format_timestamp(timestamps[i], day_cache) if timestamps[i] != NO_TIMESTAMP else None,
+        "method": methods[method_idx[i]],
+    } for i in range(count)]
+
+def write_binary(f, records, chunk_size: int = 10000, compress: bool = True) -> int:
+    f.write(HEADER.pack(MAGIC, VERSION, FLAG_ZLIB if compress else 0))
+    count = 0
+    for chunk in chunked(records, chunk_size):
+        payload = encode_chunk(chunk)
+        if compress:
+            payload = zlib.compress(payload, 6)
+        f.write(CHUNK_HEADER.pack(len(payload), len(chunk)))
+        f.write(payload)
+        count += len(chunk)
+    return count
+
+def read_binary(path: str):
+    with open(path, "rb") as f:
+        magic, version, flags = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} verified-user export")
+        while True:
+            header = f.read(CHUNK_HEADER.size)
+            if not header:
+                return
+            if len(header) < CHUNK_HEADER.size:
+                raise ValueError(f"{path}: truncated chunk header")
+            size, count = CHUNK_HEADER.unpack(header)
+            payload = f.read(size)
+            if len(payload) < size:
+                raise ValueError(f"{path}: truncated chunk")
+            if flags & FLAG_ZLIB:
+                payload = zlib.decompress(payload)
+            yield from decode_chunk(payload, count)
+
+def read_records(path: str, fmt: str = None):
+    fmt = fmt or detect_format(path)
+    if fmt == "bin":
+        return read_binary(path)
+    if fmt == "ndjson":
+        return read_ndjson(path)
+    return read_json(path)
+
+def export_records(records, path: str, fmt: str, since: datetime = None, chunk_size: int = 10000,
+                   errors: list = None, strict: bool = False) -> int:
+    # Records are checked the way import checks them, so a backup holds exactly what it restores.
+    records = validated(records, [] if errors is None else errors, strict)
+    if since:
+        records = since_filter(records, since)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            if fmt == "bin":
+                count = write_binary(f, records, chunk_size)
+            elif fmt == "ndjson":
+                count = write_ndjson(f, records)
+            else:
+                records = list(records)
+                f.write(json.dumps(records, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+                count = len(records)
+            f.flush()
+            os.fsync(f.fileno())
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return count
+
+def validated(records, errors: list, strict: bool = False):
+    for position, record in enumerate(records, 1):
+        try:
+            yield validate_record(record)
+        except ValueError as e:
+            if strict:
+                raise ValueError(f"record {position}: {e}")
+            errors.append(f"record {position}: {e}")
+
+def import_records(path: str, add_chunk, fmt: str = None, chunk_size: int = 10000, strict: bool = False) -> dict:
+    errors = []
+    imported = 0
+    for chunk in chunked(validated(read_records(path, fmt), errors, strict), chunk_size):
+        imported += add_chunk(chunk)
+    return {"imported": imported, "invalid": len(errors), "errors": errors[:20]}
+
+def open_store(args):
+    if args.shared:
+        from shared_store import SharedStore, SharedVerifiedUserStore
+        return SharedVerifiedUserStore(SharedStore(args.shared), args.guild)
+    from storage import VerifiedUserStore
+    store = VerifiedUserStore(args.store)
+    store.load()
+    return store
+
+def run_export(args) -> int:
+    store = open_store(args)
+    records = store.iter_all() if args.shared else store.all()
+    since = parse_timestamp(args.since) if args.since else None
+    errors = []
+    count = export_records(
+        records, args.output, args.format or detect_output_format(args.output), since, args.chunk_size, errors, args.strict
+    )
+    for error in errors[:20]:
+        print(f"  skipped {error}")
+    print(f"Exported {count} verified users to {args.output}, skipped {len(errors)} invalid records")
+    return 0
+
+def detect_output_format(path: str) -> str:
+    if path.endswith(".bin"):
+        return "bin"
+    return "ndjson" if path.endswith((".ndjson", ".jsonl")) else "json"
+
+def run_import(args) -> int:
+    store = open_store(args)
+    if args.replace:
+        store.replace_all([])
+
+    def add_chunk(chunk):
+        # The JSON store returns a journal line, the shared store a flag; both are falsy for duplicates.
+        return sum(1 for record in chunk if store.add(record))
+
+    result = import_records(args.input, add_chunk, args.format, args.chunk_size, args.strict)
+    store.compact(store.all())
+    for error in result["errors"]:
+        print(f"  skipped {error}")
+    print(f"Imported {result['imported']} new verified users, skipped {result['invalid']} invalid records")
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export or import verified users")
+    parser.add_argument("--store", default="data/verified_users.json", help="verified_users.json snapshot (journal is replayed)")
+    parser.add_argument("--shared", help="use this shared SQLite store instead of the JSON store")
+    parser.add_argument("--guild", type=int, default=0, help="guild id inside the shared store")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export")
+    export.add_argument("output")
+    export.add_argument("--format", choices=FORMATS)
+    export.add_argument("--since", help="only users verified at or after this ISO timestamp")
+    export.add_argument("--strict", action="store_true", help="stop at the first record that import would reject")
+
+    import_ = commands.add_parser("import")
+    import_.add_argument("input")
+    import_.add_argument("--format", choices=FORMATS)
+    import_.add_argument("--replace", action="store_true", help="drop existing users before importing")
+    import_.add_argument("--strict", action="store_true", help="stop at the first invalid record")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        return run_export(args) if args.command == "export" else run_import(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,15 @@
 import discord
 from discord.ui import Button, View, Modal, TextInput
+import asyncio
+import io
 import json
 import os
 import logging
-import random
+import string
+import time
 from datetime import datetime, timezone
+from storage import AsyncWriter, VerifiedUserStore
+from captcha import CaptchaEngine
 
 logger = logging.getLogger(__name__)
 
@@ -15,79 +20,128 @@ class Colors:
     INFO = 0x0099FF
 
 class LanguageManager:
-    def __init__(self, default_lang="en"):
+    STATIC_FIELDS = frozenset({"server_name"})
+    REQUIRED_SECTIONS = ("welcome_embed", "verification")
+
+    def __init__(self, default_lang="en", base_dir: str = None, codes: set = None):
         self.default_lang = default_lang
+        self.base_dir = base_dir or os.path.dirname(__file__)
         self.languages = {}
-        self.load_languages()
+        self.tables = {}
+        self.rendered = {}
+        self.load_languages(codes)
     
-    def load_languages(self):
+    @staticmethod
+    def language_files(base_dir: str) -> dict:
+        return {
+            file_name[len("language-"):-len(".json")]: os.path.join(base_dir, file_name)
+            for file_name in sorted(os.listdir(base_dir))
+            if file_name.startswith("language-") and file_name.endswith(".json")
+        }
+
+    @staticmethod
+    def read_languages(base_dir: str, codes: set = None) -> tuple:
+        languages, tables, failed = {}, {}, []
+        for code, path in LanguageManager.language_files(base_dir).items():
+            if codes is not None and code not in codes:
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    languages[code] = json.load(f)
+            except json.JSONDecodeError as e:
+                logger.error(f"JSON decode error in language file {os.path.basename(path)}: {e}")
+                failed.append(code)
+                continue
+            tables[code] = LanguageManager.compile_table(languages[code])
+            logger.info(f"Loaded language file {os.path.basename(path)} ({len(tables[code])} keys)")
+        return languages, tables, failed
+
+    def swap(self, languages: dict, tables: dict):
+        self.languages = languages
+        self.tables = tables
+        self.rendered = {}
+
+    def load_languages(self, codes: set = None):
         try:
-            base_dir = os.path.dirname(__file__)
+            languages, tables, _ = self.read_languages(self.base_dir, codes)
+            self.swap(languages, tables)
             
-            en_path = os.path.join(base_dir, "language-en.json")
-            if os.path.exists(en_path):
-                with open(en_path, "r", encoding="utf-8") as f:
-                    self.languages["en"] = json.load(f)
-                    logger.info("Loaded English language file")
-                    logger.debug(f"English language data keys: {list(self.languages['en'].keys())}")
-            else:
-                logger.error(f"English language file not found at: {en_path}")
-            
-            vi_path = os.path.join(base_dir, "language-vi.json")
-            if os.path.exists(vi_path):
-                with open(vi_path, "r", encoding="utf-8") as f:
-                    self.languages["vi"] = json.load(f)
-                    logger.info("Loaded Vietnamese language file")
-                    logger.debug(f"Vietnamese language data keys: {list(self.languages['vi'].keys())}")
-            else:
-                logger.error(f"Vietnamese language file not found at: {vi_path}")
+            if "en" not in self.languages:
+                logger.error(f"English language file not found in: {self.base_dir}")
             
             logger.info(f"Available languages: {list(self.languages.keys())}")
             logger.info(f"Default language: {self.default_lang}")
             
             lang_data = self.languages.get(self.default_lang, {})
-            if "welcome_embed" not in lang_data or "verification" not in lang_data:
+            if any(section not in lang_data for section in self.REQUIRED_SECTIONS):
                 logger.error(f"Default language '{self.default_lang}' is missing expected keys! Falling back to English if available.")
                     
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error in language files: {e}")
         except Exception as e:
             logger.error(f"Error loading language files: {e}")
+
+    async def load_remaining(self):
+        # Languages no guild is configured for are only needed once someone asks for them, so they load after startup.
+        codes = set(self.language_files(self.base_dir)) - set(self.tables)
+        if not codes:
+            return
+        languages, tables, _ = await asyncio.to_thread(self.read_languages, self.base_dir, codes)
+        self.swap({**self.languages, **languages}, {**self.tables, **tables})
+        logger.info(f"Available languages: {list(self.languages.keys())}")
+
+    @staticmethod
+    def compile_table(data: dict, prefix: str = "", table: dict = None) -> dict:
+        if table is None:
+            table = {}
+        for k, value in data.items():
+            key = f"{prefix}{k}"
+            if isinstance(value, dict):
+                table[key] = None
+                LanguageManager.compile_table(value, f"{key}.", table)
+                continue
+            if not isinstance(value, str):
+                value = str(value)
+            fields = frozenset(name for _, name, _, _ in string.Formatter().parse(value) if name)
+            table[key] = (value, fields)
+        return table
     
     def get(self, key: str, lang: str = None, **kwargs) -> str:
         if lang is None:
             lang = self.default_lang
-            logger.debug(f"Using default language: {lang}")
             
-        lang_data = self.languages.get(lang, self.languages.get("en", {}))
-        if not lang_data:
-            logger.warning(f"No language data available for '{lang}' or 'en', returning key: {key}")
+        table = self.tables.get(lang) or self.tables.get("en")
+        if not table:
+            logger.warning("No language data available for '%s' or 'en', returning key: %s", lang, key)
             return key
         
-        keys = key.split('.')
-        value = lang_data
-        
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
-            else:
-                logger.warning(f"Key '{key}' not found in language '{lang}', returning key as fallback")
-                return key
-        
-        if isinstance(value, dict):
-            logger.warning(f"Key '{key}' points to dict, not string")
+        entry = table.get(key, False)
+        if entry is False:
+            logger.warning("Key '%s' not found in language '%s', returning key as fallback", key, lang)
+            return key
+        if entry is None:
+            logger.warning("Key '%s' points to dict, not string", key)
             return key
             
-        if isinstance(value, str):
-            try:
-                formatted_value = value.format(**kwargs)
-                logger.debug(f"Resolved key '{key}' in language '{lang}' to: {formatted_value}")
-                return formatted_value
-            except KeyError as e:
-                logger.warning(f"Missing format key {e} for string: {value}")
-                return value
+        template, fields = entry
+        if not fields:
+            return template
         
-        return str(value)
+        if fields <= self.STATIC_FIELDS:
+            cache_key = (lang, key, tuple(kwargs.get(name) for name in sorted(fields)))
+            rendered = self.rendered.get(cache_key)
+            if rendered is None:
+                rendered = self.rendered[cache_key] = self._format(template, key, lang, kwargs)
+            return rendered
+        return self._format(template, key, lang, kwargs)
+
+    def _format(self, template: str, key: str, lang: str, kwargs: dict) -> str:
+        try:
+            formatted_value = template.format(**kwargs)
+        except KeyError as e:
+            logger.warning("Missing format key %s for string: %s", e, template)
+            return template
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Resolved key '%s' in language '%s' to: %s", key, lang, formatted_value)
+        return formatted_value
 
 class Config:
     def __init__(self, config_path: str = "config.json"):
@@ -105,118 +159,354 @@ class Config:
             logger.error(f"Invalid JSON in config file: {e}")
             raise
     
+    @staticmethod
+    def validate(data) -> dict:
+        if not isinstance(data, dict):
+            raise ValueError("config must be a JSON object")
+        for section in ("CHANNELS", "ROLES", "LINKS", "SETTINGS", "GUILDS"):
+            if not isinstance(data.get(section, {}), dict):
+                raise ValueError(f"{section} must be an object")
+        guilds = [("", data)]
+        for guild_id, overrides in data.get("GUILDS", {}).items():
+            if not str(guild_id).isdigit() or not isinstance(overrides, dict):
+                raise ValueError(f"GUILDS entry {guild_id!r} must be a guild id mapped to an object")
+            guilds.append((f"GUILDS.{guild_id}.", overrides))
+        for prefix, section in guilds:
+            for name in ("CHANNELS", "ROLES"):
+                for key, value in section.get(name, {}).items():
+                    if value and not str(value).isdigit():
+                        raise ValueError(f"{prefix}{name}.{key} must be an id, got {value!r}")
+            settings = section.get("SETTINGS", {})
+            if not isinstance(settings, dict):
+                raise ValueError(f"{prefix}SETTINGS must be an object")
+            for key in ("verification_cooldown", "max_verification_attempts", "verification_timeout", "max_tracked_users",
+                        "unverified_reminder_after", "unverified_kick_after"):
+                value = settings.get(key, 0)
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                    raise ValueError(f"{prefix}SETTINGS.{key} must be a non-negative number, got {value!r}")
+            if settings.get("verification_type", "button") not in ("button", "reaction"):
+                raise ValueError(f"{prefix}SETTINGS.verification_type must be \"button\" or \"reaction\"")
+            if settings.get("captcha_type", "math") not in ("math", "image"):
+                raise ValueError(f"{prefix}SETTINGS.captcha_type must be \"math\" or \"image\"")
+        return data
+
     def get(self, key: str, default=None):
         return self.data.get(key, default)
 
+def gateway_options(config: Config) -> dict:
+    gateway_config = config.get("GATEWAY", {})
+    if not gateway_config.get("lean_mode", True):
+        return {"intents": discord.Intents.all()}
+
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.members = True
+    intents.guild_reactions = True
+
+    member_cache = gateway_config.get("member_cache", "joined")
+    if member_cache == "all":
+        member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+    else:
+        member_cache_flags = discord.MemberCacheFlags.none()
+        member_cache_flags.joined = member_cache == "joined"
+
+    return {
+        "intents": intents,
+        "member_cache_flags": member_cache_flags,
+        "chunk_guilds_at_startup": gateway_config.get("chunk_guilds_at_startup", False),
+        "max_messages": gateway_config.get("max_messages"),
+    }
+
 class DataManager:
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, data_config: dict = None, writer: AsyncWriter = None, store=None):
         self.config = config
-        self.verified_users_file = config.get("DATA", {}).get("verified_users_file", "data/verified_users.json")
+        data_config = data_config if data_config is not None else config.get("DATA", {})
+        self.verified_users_file = data_config.get("verified_users_file", "data/verified_users.json")
+        self.compaction_interval = data_config.get("compaction_interval", 300)
         
-        data_folder = config.get("DATA", {}).get("folder", "data")
+        data_folder = data_config.get("folder", "data")
         os.makedirs(data_folder, exist_ok=True)
+        self.state_file = data_config.get("state_file", os.path.join(data_folder, "state.json"))
+        self.state = {}
         
-        if not os.path.exists(self.verified_users_file):
-            self.save_json(self.verified_users_file, [])
+        self.owns_writer = writer is None
+        self.writer = writer or AsyncWriter(data_config.get("flush_delay", 0.05))
+        self.store = store if store is not None else VerifiedUserStore(self.verified_users_file, data_config.get("verified_users_journal"))
+        self.store_loaded = False
+        self.compact_lock = asyncio.Lock()
+        self.last_compaction = time.monotonic()
+        self.closed = False
+
+    async def load(self):
+        await self.load_state()
+        await self.load_store()
+
+    async def load_state(self):
+        self.state = await self.load_json(self.state_file, {})
+
+    async def load_store(self):
+        if self.store_loaded:
+            return
+        async with self.compact_lock:
+            if not self.store_loaded:
+                # Journal lines queued since the last unload have to land before they are replayed.
+                await self.writer.drain()
+                await self.writer.run(self.store.load)
+                self.store_loaded = True
+
+    async def unload_store(self):
+        if not self.store_loaded:
+            return
+        async with self.compact_lock:
+            if self.store.pending_entries:
+                await self._compact()
+            # Users added while compacting are already queued on the journal, so dropping the index loses nothing.
+            self.store_loaded = False
+            self.store.unload()
+            self.store.pending_entries = 0
 
-    def load_json(self, file_path: str, default=None):
+    async def update_state(self, **values):
+        self.state.update(values)
+        await self.save_json(self.state_file, self.state)
+
+    def _read_json(self, file_path: str, default=None):
         try:
             with open(file_path, "r", encoding="utf-8") as f:
                 return json.load(f)
         except (FileNotFoundError, json.JSONDecodeError) as e:
             logger.warning(f"Could not load {file_path}: {e}")
-            return default or []
+            return [] if default is None else default
+
+    async def load_json(self, file_path: str, default=None):
+        return await self.writer.run(self._read_json, file_path, default)
 
-    def save_json(self, file_path: str, data):
+    async def save_json(self, file_path: str, data):
         try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            await self.writer.save_json(file_path, data, indent=2, ensure_ascii=False)
         except Exception as e:
             logger.error(f"Error saving {file_path}: {e}")
 
+    async def get_verified_user(self, user_id: int):
+        # The shared SQLite store can wait on another process's write lock, so it is only queried on the writer thread.
+        if self.store.blocking:
+            return await self.writer.run(self.store.get, user_id)
+        return self.store.get(user_id)
+
+    async def is_verified(self, user_id: int) -> bool:
+        if self.store.blocking:
+            return await self.writer.run(self.store.__contains__, user_id)
+        return user_id in self.store
+
+    async def add_verified_user(self, user, method: str) -> bool:
+        record = {
+            "id": user.id,
+            "name": str(user),
+            "verified_at": str(datetime.now(timezone.utc)),
+            "method": method
+        }
+        if not self.store_loaded:
+            await self.load_store()
+        if self.store.blocking:
+            return await self.writer.run(self.store.add, record)
+        line = self.store.add(record)
+        if line is None:
+            return False
+        try:
+            await self.writer.append_lines(self.store.journal_path, [line])
+        except Exception as e:
+            logger.error(f"Error appending {user.id} to {self.store.journal_path}: {e}")
+        return True
+
     def get_verified_users(self) -> list:
-        return self.load_json(self.verified_users_file)
+        return self.store.all()
+
+    async def save_verified_users(self, users: list):
+        await self.load_store()
+        async with self.compact_lock:
+            self.store.replace_all(users)
+            await self._compact()
 
-    def save_verified_users(self, users: list):
-        self.save_json(self.verified_users_file, users)
+    async def compact(self):
+        async with self.compact_lock:
+            await self._compact()
+
+    async def _compact(self):
+        # Appends need no lock: the index is updated on the event loop and journal lines go through the single writer thread in order.
+        self.last_compaction = time.monotonic()
+        # The shared store has no snapshot to write, and an unloaded index is empty, so snapshotting it would wipe every stored user.
+        if self.store.blocking or not self.store_loaded:
+            return
+        await self.writer.drain()
+        records = self.store.all()
+        pending, self.store.pending_entries = self.store.pending_entries, 0
+        try:
+            await self.writer.run(self.store.compact, records)
+            logger.info(f"Compacted {len(records)} verified users into {self.verified_users_file}")
+        except Exception as e:
+            self.store.pending_entries += pending
+            logger.error(f"Error compacting {self.verified_users_file}: {e}")
+
+    async def maybe_compact(self):
+        if self.store.pending_entries and time.monotonic() - self.last_compaction >= self.compaction_interval:
+            await self.compact()
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.store_loaded and self.store.pending_entries:
+            await self.compact()
+        await self.writer.drain()
+        if self.owns_writer:
+            self.writer.shutdown()
+
+async def send_ephemeral(interaction: discord.Interaction, embed: discord.Embed):
+    # A deferred interaction can only be answered with a followup message.
+    if interaction.response.is_done():
+        await interaction.followup.send(embed=embed, ephemeral=True)
+    else:
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
 class CaptchaModal(Modal):
-    def __init__(self, bot, user_id: int):
-        super().__init__(title=bot.lang.get("captcha.title"), timeout=300)
+    def __init__(self, bot, context, user_id: int, challenge):
+        lang = context.language
+        super().__init__(title=bot.lang.get("captcha.title", lang), timeout=context.settings.get("verification_timeout", 300))
         self.bot = bot
+        self.context = context
         self.user_id = user_id
-        self.num1, self.num2 = random.randint(1, 20), random.randint(1, 20)
-        self.answer = self.num1 + self.num2
         
+        if challenge.kind == "image":
+            label = bot.lang.get("captcha.image_question", lang)
+            max_length = challenge.prompt["length"]
+        else:
+            label = bot.lang.get("captcha.question", lang, **challenge.prompt)
+            max_length = 3
         self.captcha_input = TextInput(
-            label=bot.lang.get("captcha.question", num1=self.num1, num2=self.num2),
-            placeholder=bot.lang.get("captcha.placeholder"),
+            label=label,
+            placeholder=bot.lang.get("captcha.placeholder", lang),
             min_length=1, 
-            max_length=3, 
+            max_length=max_length, 
             required=True
         )
         self.add_item(self.captcha_input)
 
     async def on_submit(self, interaction: discord.Interaction):
+        with self.bot.metrics.span("captcha_modal.on_submit"):
+            await self._on_submit(interaction)
+
+    async def _on_submit(self, interaction: discord.Interaction):
         try:
-            user_answer = int(self.captcha_input.value.strip())
-            if user_answer == self.answer:
+            result = self.bot.captcha.check(self.context.guild_id, self.user_id, self.captcha_input.value)
+            if result == CaptchaEngine.PASSED:
+                self.bot.analytics.guild(self.context.guild_id).record_captcha(True)
                 await interaction.response.defer()
                 await self.bot.verify_user(interaction.user, interaction.guild, "captcha", interaction)
-            else:
+            elif result == CaptchaEngine.EXPIRED:
                 await interaction.response.send_message(
-                    embed=self.bot.create_embed(
-                        self.bot.lang.get("captcha.incorrect"), 
-                        Colors.ERROR
-                    ), 
-                    ephemeral=True
+                    embed=self.context.embeds.status_reply("captcha.timeout", Colors.WARNING), ephemeral=True
                 )
-        except ValueError:
-            await interaction.response.send_message(
-                embed=self.bot.create_embed(
-                    self.bot.lang.get("captcha.invalid"), 
-                    Colors.ERROR
-                ), 
-                ephemeral=True
-            )
+            else:
+                await self.reject(interaction, "captcha.invalid" if result == CaptchaEngine.INVALID else "captcha.incorrect")
         except Exception as e:
             logger.error(f"Error in captcha modal: {e}")
-            if not interaction.response.is_done():
-                await interaction.response.send_message(
-                    embed=self.bot.create_embed("An error occurred. Please try again.", Colors.ERROR),
-                    ephemeral=True
-                )
+            await send_ephemeral(interaction, self.context.embeds.reply("An error occurred. Please try again.", Colors.ERROR))
+
+    async def reject(self, interaction: discord.Interaction, key: str):
+        self.bot.analytics.guild(self.context.guild_id).record_captcha(False)
+        context = self.context
+        if await context.run_limiter(context.limiter.record_failure, self.user_id) == 0:
+            embed = context.embeds.status_reply(
+                "verification.too_many_attempts", Colors.WARNING,
+                seconds=await context.run_limiter(context.limiter.locked_remaining, self.user_id)
+            )
+        else:
+            embed = self.context.embeds.status_reply(key, Colors.ERROR)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
     async def on_timeout(self):
         logger.info(f"Captcha modal timed out for user {self.user_id}")
 
+class CaptchaAnswerButton(Button):
+    def __init__(self, bot, context, challenge):
+        super().__init__(
+            label=bot.lang.get("captcha.answer_button", context.language),
+            style=discord.ButtonStyle.primary,
+            emoji="⌨️"
+        )
+        self.bot = bot
+        self.context = context
+        self.challenge = challenge
+
+    async def callback(self, interaction: discord.Interaction):
+        await interaction.response.send_modal(CaptchaModal(self.bot, self.context, interaction.user.id, self.challenge))
+
 class VerifyButton(Button):
-    def __init__(self, bot):
-        emoji = bot.config.get("SETTINGS", {}).get("button_emoji", None)
+    def __init__(self, bot, context=None):
+        settings = context.settings if context else bot.settings
+        lang = context.language if context else None
         super().__init__(
-            label=bot.lang.get("verification.button_label"), 
+            label=bot.lang.get("verification.button_label", lang), 
             style=discord.ButtonStyle.success, 
             custom_id="verify_now",
-            emoji=emoji
+            emoji=settings.get("button_emoji", None)
         )
         self.bot = bot
     
     async def callback(self, interaction: discord.Interaction):
+        with self.bot.metrics.span("verify_button.callback"):
+            await self._callback(interaction)
+
+    async def send_challenge(self, interaction: discord.Interaction, context):
+        settings = context.settings
+        kind = settings.get("captcha_type", "math")
+        if not self.bot.captcha.ready(kind):
+            # An image rendered on demand can take longer than Discord waits for the acknowledgement.
+            await interaction.response.defer(ephemeral=True, thinking=True)
+        challenge = await self.bot.captcha.issue(
+            context.guild_id, interaction.user.id, kind,
+            settings.get("verification_timeout", 300)
+        )
+        if challenge.image is None:
+            await interaction.response.send_modal(CaptchaModal(self.bot, context, interaction.user.id, challenge))
+            return
+        # Modals cannot show images, so the image goes in an ephemeral message with a button that opens the modal.
+        view = View(timeout=settings.get("verification_timeout", 300))
+        view.add_item(CaptchaAnswerButton(self.bot, context, challenge))
+        send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+        await send(
+            embed=context.embeds.captcha_image(),
+            file=discord.File(io.BytesIO(challenge.image), filename="captcha.png"),
+            view=view,
+            ephemeral=True
+        )
+
+    async def _callback(self, interaction: discord.Interaction):
         try:
-            if self.bot.settings.get("enable_captcha", True):
-                await interaction.response.send_modal(CaptchaModal(self.bot, interaction.user.id))
+            # The verified-user index is only needed once the interaction is deferred, so a cold store does not time it out.
+            context = await self.bot.guild_registry.get(interaction.guild_id, load_store=False)
+            if not context:
+                await interaction.response.send_message(
+                    embed=self.bot.embeds.status_reply("errors.guild_not_found", Colors.ERROR),
+                    ephemeral=True
+                )
+                return
+            locked = await context.run_limiter(context.limiter.locked_remaining, interaction.user.id)
+            if locked > 0:
+                await interaction.response.send_message(
+                    embed=context.embeds.status_reply("verification.too_many_attempts", Colors.WARNING, seconds=locked),
+                    ephemeral=True
+                )
+                return
+            if context.settings.get("enable_captcha", True):
+                await self.send_challenge(interaction, context)
             else:
                 await interaction.response.defer()
                 await self.bot.verify_user(interaction.user, interaction.guild, "button", interaction)
         except Exception as e:
             logger.error(f"Error in verify button callback: {e}")
-            if not interaction.response.is_done():
-                await interaction.response.send_message(
-                    embed=self.bot.create_embed("An error occurred. Please try again.", Colors.ERROR),
-                    ephemeral=True
-                )
+            await send_ephemeral(interaction, self.bot.embeds.reply("An error occurred. Please try again.", Colors.ERROR))
 
-def create_verify_view(bot):
+def create_verify_view(bot, context=None):
     view = View(timeout=None)
-    view.add_item(VerifyButton(bot))
+    view.add_item(VerifyButton(bot, context))
     return view